@@ -4,8 +4,19 @@
 Library Management System - Main Entry Point
 """
 
+import sys
+
 from libsys import LibrarySystem
 
 if __name__ == "__main__":
+    try:
+        import readline  # gives input() line editing, history and reliable paste
+    except ImportError:  # not available on Windows
+        pass
+
+    # บนเทอร์มินัล stdout จะ flush ทุกบรรทัด; ปิดไว้แล้วปล่อยให้ input() flush ครั้งเดียวก่อนรอคำตอบ
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(line_buffering=False)
+
     system = LibrarySystem()
     system.run()
\ No newline at end of file
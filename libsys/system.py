@@ -7,33 +7,253 @@ This module contains the LibrarySystem class: a file-backed simple
 library management CLI using fixed-size struct-packed records.
 """
 
+import re
 import struct
+import sys
 import os
+import time
 import datetime
-from typing import List
+import functools
+import itertools
+import mmap
+from collections import Counter, defaultdict, deque
+from operator import itemgetter
+from typing import List, Tuple
+
+
+# ข้อความบันทึกการดำเนินการ: เก็บเป็นรหัส + อาร์กิวเมนต์ แล้วค่อยจัดรูปแบบตอนแสดงผล
+HISTORY_MESSAGES = {
+    'add_book': "เพิ่มหนังสือ '{}' ID: {} จำนวน {} เล่ม",
+    'update_book': "แก้ไขหนังสือ ID: {}",
+    'delete_book': "ลบหนังสือ ID: {}",
+    'add_member': "เพิ่มสมาชิก '{}' ID: {}",
+    'update_member': "แก้ไขสมาชิก ID: {}",
+    'delete_member': "ลบสมาชิก ID: {}",
+    'borrow': "ยืมหนังสือ '{}' {} เล่ม (รหัส: {}) โดยสมาชิก ID: {}",
+    'return': "คืนหนังสือ '{}' {} เล่ม (รหัส: {}) โดยสมาชิก ID: {}",
+    'delete_borrow': "ลบรายการยืม ID: {}",
+}
+HISTORY_LIMIT = 1000
+
+# เมนูประกอบเป็นสตริงเดียวตอน import ไม่ต้องสร้างใหม่ทุกครั้งที่แสดง (มีขึ้นบรรทัดท้ายแล้ว เขียนได้ทันที)
+MAIN_MENU = "\n".join([
+    "\n" + "=" * 70,
+    " " * 25 + "🏛️ ระบบจัดการห้องสมุด 🏛️",
+    " " * 20 + "Library Management System v1.0",
+    "=" * 70,
+    "\n📋 เมนูหลัก:",
+    " ",
+    "─" * 70,
+    "1. 📚 จัดการหนังสือ (Books Management)",
+    "2. 👥 จัดการสมาชิก (Members Management)",
+    "3. 📖 จัดการการยืม-คืน (Borrow/Return Management)",
+    "4. 📊 ดูสถิติโดยสรุป (Statistics)",
+    "5. 📄 สร้างรายงาน (Generate Report)",
+    "0. 🚪 ออกจากระบบ (Exit)",
+    "─" * 70,
+]) + "\n"
+BOOK_MENU = "\n".join([
+    "\n" + "=" * 60,
+    " " * 20 + "📚 เมนูจัดการหนังสือ 📚",
+    "=" * 60,
+    "\n📋 เลือกการดำเนินการ:",
+    "─" * 60,
+    "1. ➕ เพิ่มหนังสือ (Add Book)",
+    "2. 👁️  ดูข้อมูลหนังสือ (View Books)",
+    "3. ✏️  แก้ไขหนังสือ (Update Book)",
+    "4. 🗑️ ลบหนังสือ (Delete Book)",
+    "0. 🔙 กลับเมนูหลัก",
+    "─" * 60,
+]) + "\n"
+MEMBER_MENU = "\n".join([
+    "\n" + "=" * 60,
+    " " * 20 + "👥 เมนูจัดการสมาชิก 👥",
+    "=" * 60,
+    "\n📋 เลือกการดำเนินการ:",
+    "─" * 60,
+    "1. ➕ เพิ่มสมาชิก (Add Member)",
+    "2. 👁️  ดูข้อมูลสมาชิก (View Members)",
+    "3. ✏️  แก้ไขสมาชิก (Update Member)",
+    "4. 🗑️ ลบสมาชิก (Delete Member)",
+    "0. 🔙 กลับเมนูหลัก",
+    "─" * 60,
+]) + "\n"
+BORROW_MENU = "\n".join([
+    "\n" + "=" * 60,
+    " " * 20 + "📖 เมนูจัดการการยืม-คืน 📖",
+    "=" * 60,
+    "\n📋 เลือกการดำเนินการ:",
+    "─" * 60,
+    "1. 📚 ยืมหนังสือ (Borrow Book)",
+    "2. 🔄 คืนหนังสือ (Return Book)",
+    "3. 👁️  ดูรายการยืม (View Borrows)",
+    "4. 🗑️ ลบรายการยืม (Delete Borrow)",
+    "0. 🔙 กลับเมนูหลัก",
+    "─" * 60,
+]) + "\n"
+EXIT_BANNER = "\n".join([
+    "\n" + "=" * 60,
+    " " * 20 + "🙏 ขอบคุณที่ใช้บริการ! 🙏",
+    " " * 15 + "Thank you for using our service!",
+    "=" * 60,
+]) + "\n"
+PROMPT_CONTINUE = "กด Enter เพื่อดำเนินการต่อ..."
+INVALID_MAIN_CHOICE = "\n❌ กรุณาเลือกเมนูที่ถูกต้อง (0-5)"
+INVALID_SUB_CHOICE = "\n❌ กรุณาเลือกเมนูที่ถูกต้อง (0-4)"
+
+# ชื่อฟิลด์ของแต่ละระเบียน เรียงตามลำดับใน struct format
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'year', 'quantity', 'status', 'deleted')
+MEMBER_FIELDS = ('id', 'name', 'email', 'phone', 'join_date', 'status', 'deleted')
+BORROW_FIELDS = ('id', 'book_id', 'member_id', 'borrow_date', 'return_date', 'status', 'deleted')
+
+
+def field_offsets(fmt: str, fields) -> dict:
+    """Map each field name to its byte offset inside a record packed with fmt"""
+    prefix = fmt[0] if fmt[0] in '@=<>!' else ''
+    codes = re.findall(r'\d*[a-zA-Z?]', fmt)
+    return {name: struct.calcsize(prefix + ''.join(codes[:i])) for i, name in enumerate(fields)}
+
+
+# every record type ends with (status, deleted)
+_status_and_deleted = itemgetter(-2, -1)
+
+# report labels looked up by raw status byte (anything not listed falls back to the default)
+REPORT_BORROW_STATUS = {b'B': "Borrowed", b'R': "Returned"}
+REPORT_BANNED = {b'S': "yes"}
+# one borrow row of the report table; %-formatting with a fixed template skips per-row f-string setup
+REPORT_ROW = "%-4s | %-8.8s | %-12s | %-18.18s | %-18.18s | %-11s | %-11s | %-9s | %s"
+
+
+@functools.lru_cache(maxsize=None)
+def _encode_block(text: str, encoding: str, errors: str) -> bytes:
+    return text.encode(encoding, errors)
+
+
+def write_block(text: str):
+    """Write a constant block (menu, banner) to stdout's byte layer, encoded once per stream encoding"""
+    stream = sys.stdout
+    buffer = getattr(stream, 'buffer', None)
+    if buffer is None:  # replaced stdout without a byte layer (IDE console, StringIO)
+        stream.write(text)
+        return
+    data = _encode_block(text, stream.encoding or 'utf-8', stream.errors or 'strict')
+    stream.flush()  # keep earlier text output ahead of the raw bytes
+    buffer.write(data)
+
+
+@functools.lru_cache(maxsize=2048)
+def encode_field(text: str, length: int) -> bytes:
+    """Encode text into a NUL-padded field of length bytes"""
+    data = text.encode('utf-8')
+    # ค่าที่ยาวพอดีฟิลด์อยู่แล้ว (ID, วันที่) ไม่ต้องตัดหรือเติม
+    if len(data) == length:
+        return data
+    return data[:length].ljust(length, b'\x00')
+
+
+@functools.lru_cache(maxsize=8)
+def format_timestamp(epoch_sec: int) -> str:
+    """Local 'YYYY-MM-DD HH:MM:SS' for a whole-second epoch"""
+    return datetime.datetime.fromtimestamp(epoch_sec).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_ymd(date_str: str):
+    """Parse a YYYY-MM-DD date string (None if malformed)"""
+    if len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-':
+        return None
+    year, month, day = date_str[:4], date_str[5:7], date_str[8:]
+    if not (year.isdigit() and month.isdigit() and day.isdigit()):
+        return None
+    try:
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:  # out-of-range month/day such as 2025-02-30
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def decode_field(data: bytes) -> str:
+    """Decode a NUL-padded record field"""
+    data = data.rstrip(b'\x00')
+    # IDs, dates and flags are plain ASCII; only Thai names need the UTF-8 decoder
+    if data.isascii():
+        return data.decode('ascii')
+    return data.decode('utf-8')
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_quantity(data: bytes, default=1):
+    """Book quantity field as int (default for old records without one)"""
+    try:
+        text = decode_field(data)
+        if text.isdecimal():  # the normal case
+            return int(text)
+        return int(text)  # sign or surrounding spaces
+    except ValueError:  # includes UnicodeDecodeError from a corrupted field
+        return default  # fallback for old records
 
 
 class LibrarySystem:
     def __init__(self):
-        # struct formats
-        self.book_format = '4s100s50s20s4s4s1s1s'  # Added 4s for quantity field
-        self.book_size = struct.calcsize(self.book_format)
+        # struct formats (compiled once; record parsers reuse the Struct objects).
+        # "=" pins the layout to standard sizes with no alignment padding; for these
+        # all-bytes formats the record sizes are unchanged, so existing .dat files still load
+        self.book_format = '=4s100s50s20s4s4s1s1s'  # Added 4s for quantity field
+        self._book_struct = struct.Struct(self.book_format)
+        self.book_size = self._book_struct.size
+        # reused for every single-book write (pack_into instead of a fresh bytes per pack)
+        self._book_write_buf = bytearray(self.book_size)
         
         # Old format for backward compatibility
-        self.old_book_format = '4s100s50s20s4s1s1s'
-        self.old_book_size = struct.calcsize(self.old_book_format)
+        self.old_book_format = '=4s100s50s20s4s1s1s'
+        self._old_book_struct = struct.Struct(self.old_book_format)
+        self.old_book_size = self._old_book_struct.size
 
-        self.member_format = '4s50s50s15s10s1s1s'
-        self.member_size = struct.calcsize(self.member_format)
+        self.member_format = '=4s50s50s15s10s1s1s'
+        self._member_struct = struct.Struct(self.member_format)
+        self.member_size = self._member_struct.size
 
-        self.borrow_format = '4s4s4s10s10s1s1s'
-        self.borrow_size = struct.calcsize(self.borrow_format)
+        self.borrow_format = '=4s4s4s10s10s1s1s'
+        self._borrow_struct = struct.Struct(self.borrow_format)
+        self.borrow_size = self._borrow_struct.size
+
+        # field offsets: lets scans test a flag byte without unpacking the whole record
+        self.book_offsets = field_offsets(self.book_format, BOOK_FIELDS)
+        self.member_offsets = field_offsets(self.member_format, MEMBER_FIELDS)
+        self.borrow_offsets = field_offsets(self.borrow_format, BORROW_FIELDS)
 
         # filenames
         self.books_file = 'books.dat'
         self.members_file = 'members.dat'
         self.borrows_file = 'borrows.dat'
         self.report_file = 'library_report.txt'
+        self._struct_by_file = {
+            self.books_file: self._book_struct,
+            self.members_file: self._member_struct,
+            self.borrows_file: self._borrow_struct,
+        }
+        self._field_offsets_by_file = {
+            self.books_file: tuple(self.book_offsets.values()),
+            self.members_file: tuple(self.member_offsets.values()),
+            self.borrows_file: tuple(self.borrow_offsets.values()),
+        }
+
+        # in-memory record cache: filename -> ((mtime_ns, size), records, {id: index})
+        self._record_cache = {}
+        # active-borrow indexes (all (index, borrow) in file order, copies per book id,
+        # (index, borrow) per raw member id), rebuilt only when the cached borrows list changes
+        self._active_borrows = []
+        self._borrowed_counts = Counter()
+        self._active_borrows_by_member = {}
+        self._borrows_by_member = {}
+        self._active_borrows_source = None
+        # decoded search columns: (filename, field, ignore_case) -> (records, texts)
+        self._text_columns = {}
+        # non-deleted records per file: filename -> (records, live records)
+        self._live_records = {}
+        # append-only and read/write descriptors, opened on first write and kept until close()
+        self._append_fds = {}
+        self._rw_fds = {}
 
         # initialize files
         self._initialize_files()
@@ -41,8 +261,35 @@ class LibrarySystem:
         # migrate old data if needed
         self._migrate_old_data()
 
-        # history
-        self.operation_history = []
+        # history: (time_ns, op_code, args) tuples, capped at HISTORY_LIMIT entries
+        self.operation_history = deque(maxlen=HISTORY_LIMIT)
+
+        # ตารางเมนู: ตัวเลือก -> เมธอด ค้นหาด้วย dict ครั้งเดียวแทน if/elif ทีละข้อ
+        self._main_dispatch = {
+            '1': self._handle_book_menu,
+            '2': self._handle_member_menu,
+            '3': self._handle_borrow_menu,
+            '4': self.view_statistics,
+            '5': self.generate_report,
+        }
+        self._book_dispatch = {
+            '1': self.add_book,
+            '2': self.view_books,
+            '3': self.update_book,
+            '4': self.delete_book,
+        }
+        self._member_dispatch = {
+            '1': self.add_member,
+            '2': self.view_members,
+            '3': self.update_member,
+            '4': self.delete_member,
+        }
+        self._borrow_dispatch = {
+            '1': self.add_borrow,
+            '2': self.return_book,
+            '3': self.view_borrows,
+            '4': self.delete_borrow,
+        }
 
     def _initialize_files(self):
         for filename in [self.books_file, self.members_file, self.borrows_file]:
@@ -51,7 +298,10 @@ class LibrarySystem:
 
     def _migrate_old_data(self):
         """Migrate old book data to new format with quantity field"""
-        if not os.path.exists(self.books_file) or os.path.getsize(self.books_file) == 0:
+        # _initialize_files สร้างไฟล์ไว้แล้ว: stat ครั้งเดียวพอ ไม่ต้องอ่านทั้งไฟล์ถ้าเป็นรูปแบบใหม่อยู่แล้ว
+        size = os.stat(self.books_file).st_size
+        if size % self.book_size == 0:
+            # empty, or data is already in new format
             return
         
         try:
@@ -59,11 +309,6 @@ class LibrarySystem:
             with open(self.books_file, 'rb') as f:
                 data = f.read()
             
-            # Check if we need to migrate
-            if len(data) % self.book_size == 0:
-                # Data is already in new format
-                return
-            
             if len(data) % self.old_book_size != 0:
                 # Data is corrupted, skip migration
                 print("Warning: Book data file appears to be corrupted. Skipping migration.")
@@ -76,27 +321,22 @@ class LibrarySystem:
             with open(backup_file, 'wb') as f:
                 f.write(data)
             
-            # Convert old records to new format
-            new_data = b''
-            for i in range(0, len(data), self.old_book_size):
-                old_record = data[i:i + self.old_book_size]
-                if len(old_record) == self.old_book_size:
-                    # Unpack old format
-                    old_book = struct.unpack(self.old_book_format, old_record)
-                    
-                    # Pack in new format with quantity = 1
-                    new_book = struct.pack(
-                        self.book_format,
-                        old_book[0],  # id
-                        old_book[1],  # title
-                        old_book[2],  # author
-                        old_book[3],  # isbn
-                        old_book[4],  # year
-                        self._encode_string("1", 4),  # quantity = 1
-                        old_book[5],  # status
-                        old_book[6]   # deleted
-                    )
-                    new_data += new_book
+            # Convert old records to new format (packed straight into one preallocated buffer)
+            new_data = bytearray(len(data) // self.old_book_size * self.book_size)
+            quantity_one = self._encode_number(1)
+            for n, old_book in enumerate(self._old_book_struct.iter_unpack(data)):
+                # Pack in new format with quantity = 1
+                self._book_struct.pack_into(
+                    new_data, n * self.book_size,
+                    old_book[0],  # id
+                    old_book[1],  # title
+                    old_book[2],  # author
+                    old_book[3],  # isbn
+                    old_book[4],  # year
+                    quantity_one,  # quantity = 1
+                    old_book[5],  # status
+                    old_book[6]   # deleted
+                )
             
             # Write new data
             with open(self.books_file, 'wb') as f:
@@ -108,63 +348,267 @@ class LibrarySystem:
             print(f"Migration failed: {e}")
             print("Please check your data files manually.")
 
-    def _get_next_id(self, filename: str, record_size: int) -> str:
-        if not os.path.exists(filename) or os.path.getsize(filename) == 0:
-            return "0001"
-
+    def _load_records(self, filename: str, record_struct: struct.Struct):
+        """Return (records, id_index) for filename, re-reading it only when it changed"""
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return [], {}
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._record_cache.get(filename)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        # map ไฟล์แล้วให้ iter_unpack แยกระเบียนใน C ตรงจากหน้าแคชของ OS ไม่ต้องคัดลอกทั้งไฟล์เป็น bytes
+        # (ระเบียนท้ายไฟล์ที่ไม่ครบจะถูกข้าม)
+        records = []
         with open(filename, 'rb') as f:
-            f.seek(-record_size, 2)
-            last_record = f.read(record_size)
+            size = os.fstat(f.fileno()).st_size
+            usable = size - size % record_struct.size
+            if usable:  # mmap cannot map an empty file
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if hasattr(mapped, 'madvise'):  # Python 3.8+ on POSIX
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)  # one front-to-back pass, read ahead
+                    with memoryview(mapped) as view:
+                        records = list(record_struct.iter_unpack(view[:usable]))
+
+        id_index = {}
+        for index, record in enumerate(records):
+            if record[-1] == b'0':
+                id_index[record[0]] = index
+
+        self._record_cache[filename] = (key, records, id_index)
+        return records, id_index
+
+    def _append_record(self, filename: str, data: bytes):
+        """Append one or more packed records with a single os.write on a persistent descriptor"""
+        fd = self._append_fds.get(filename)
+        if fd is None:
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+            fd = os.open(filename, flags, 0o644)
+            self._append_fds[filename] = fd
+        os.write(fd, data)
+        self._patch_cache(filename, [(None, data)])
+
+    def _get_rw_fd(self, filename: str) -> int:
+        fd = self._rw_fds.get(filename)
+        if fd is None:
+            fd = os.open(filename, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            self._rw_fds[filename] = fd
+        return fd
+
+    def _write_at(self, fd: int, data, offset: int):
+        if hasattr(os, 'pwrite'):
+            os.pwrite(fd, data, offset)
+        else:  # Windows: no pwrite
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+
+    def close(self):
+        """Close the descriptors held open for appending and in-place updates"""
+        for fds in (self._append_fds, self._rw_fds):
+            for fd in fds.values():
+                os.close(fd)
+            fds.clear()
+
+    def __del__(self):
+        if getattr(self, '_append_fds', None) or getattr(self, '_rw_fds', None):
+            self.close()
+
+    def _invalidate_cache(self, filename: str):
+        # mtime อาจไม่เปลี่ยนถ้าเขียนทับภายในช่วงความละเอียดของนาฬิกา จึงล้างแคชเองทุกครั้งที่เขียน
+        self._record_cache.pop(filename, None)
+
+    def _patch_cache(self, filename: str, updates):
+        """Apply just-written (index, data) pairs to the cached records and id index"""
+        cached = self._record_cache.get(filename)
+        if cached is None:
+            return
 
-        if filename == self.books_file:
-            last_id = struct.unpack(self.book_format, last_record)[0]
-        elif filename == self.members_file:
-            last_id = struct.unpack(self.member_format, last_record)[0]
-        else:
-            last_id = struct.unpack(self.borrow_format, last_record)[0]
+        record_struct = self._struct_by_file[filename]
+        end = len(cached[1])
+        placed = []
+        expected_size = 0
+        for index, data in updates:
+            if index is None:
+                index = end
+            expected_size = max(expected_size, index * record_struct.size + len(data))
+            for position, record in enumerate(record_struct.iter_unpack(data), index):
+                placed.append((position, record))
+                end = max(end, position + 1)
+        self._patch_cached_records(filename, placed, expected_size)
+
+    def _patch_cached_records(self, filename: str, placed, min_size: int = 0):
+        """Put already-unpacked (position, record) pairs into the cache (see _patch_cache)"""
+        cached = self._record_cache.get(filename)
+        if cached is None:
+            return
+
+        record_struct = self._struct_by_file[filename]
+        (_, cached_size), records, id_index = cached
+        if cached_size % record_struct.size:
+            # partial tail record: offsets would not line up with the list
+            self._invalidate_cache(filename)
+            return
+
+        records = list(records)
+        id_index = dict(id_index)
+        for position, record in placed:
+            if position < len(records):
+                old_id = records[position][0]
+                if id_index.get(old_id) == position:
+                    del id_index[old_id]
+                records[position] = record
+            elif position == len(records):
+                records.append(record)
+            else:
+                self._invalidate_cache(filename)
+                return
+            if record[-1] == b'0':
+                id_index[record[0]] = position
+
+        stat = os.stat(filename)
+        if stat.st_size != max(cached_size, min_size):
+            # someone else changed the file too; reload it next time
+            self._invalidate_cache(filename)
+            return
+        self._record_cache[filename] = ((stat.st_mtime_ns, stat.st_size), records, id_index)
+
+    def _record_lookup(self, filename):
+        """Return a raw-ID -> record resolver over one cache snapshot, for joins in loops"""
+        records, id_index = self._load_records(filename, self._struct_by_file[filename])
+        get_index = id_index.get
+
+        def lookup(raw_id):
+            index = get_index(raw_id)
+            return records[index] if index is not None else None
+        return lookup
+
+    def _get_next_id(self, filename: str) -> str:
+        # ID ล่าสุดคือระเบียนท้ายสุดในแคช ไม่ต้องเปิดไฟล์เพื่ออ่านท้ายไฟล์ทุกครั้ง
+        records = self._load_records(filename, self._struct_by_file[filename])[0]
+        if not records:
+            return "0001"
 
-        last_id_num = int(last_id.decode('utf-8').strip('\x00'))
+        last_id_num = int(records[-1][0].rstrip(b'\x00'))
         return f"{last_id_num + 1:04d}"
 
+    def _log_operation(self, op_code: str, *args):
+        self.operation_history.append((time.time_ns(), op_code, args))
+
+    def _format_history_entry(self, entry) -> str:
+        timestamp_ns, op_code, args = entry
+        timestamp = datetime.datetime.fromtimestamp(timestamp_ns // 1_000_000_000).replace(
+            microsecond=timestamp_ns // 1000 % 1_000_000
+        )
+        return f"{timestamp}: {HISTORY_MESSAGES[op_code].format(*args)}"
+
+    def _render_history(self, limit=None):
+        """Yield formatted history lines, newest first; entries are only formatted when read"""
+        for entry in itertools.islice(reversed(self.operation_history), limit):
+            yield self._format_history_entry(entry)
+
+    def _parse_ymd(self, date_str: str):
+        """Parse a YYYY-MM-DD date string; return None if it is malformed"""
+        return parse_ymd(date_str)
+
     def _encode_string(self, text: str, length: int) -> bytes:
-        return text.encode('utf-8')[:length].ljust(length, b'\x00')
+        return encode_field(text, length)
+
+    def _encode_number(self, value: int) -> bytes:
+        """Encode a year/quantity for a 4s field; struct pads the short ones with NULs"""
+        return b'%d' % int(value)
+
+    def _encode_id(self, text: str) -> bytes:
+        """Encode an ID the way it is stored, for comparing against raw record fields"""
+        data = text.encode('utf-8')
+        # too-long input must not be truncated into a match with a stored ID
+        return data.ljust(4, b'\x00') if len(data) <= 4 else data
+
+    def _text_column(self, filename: str, field: int, ignore_case=True):
+        """Return (records, texts): one decoded (and lowercased) field of every cached record"""
+        records = self._load_records(filename, self._struct_by_file[filename])[0]
+        key = (filename, field, ignore_case)
+        cached = self._text_columns.get(key)
+        if cached is not None and cached[0] is records:
+            return records, cached[1]
+
+        # ถอดรหัสและแปลงเป็นตัวพิมพ์เล็กทั้งคอลัมน์ในครั้งเดียว แทนการทำทีละระเบียน
+        column = b'\n'.join(record[field] for record in records).decode('utf-8')
+        if ignore_case:
+            column = column.lower()
+        texts = column.split('\n') if records else []
+        if len(texts) != len(records):
+            # a stored value contains a newline; fall back to per-record decoding
+            texts = [self._decode_string(record[field]) for record in records]
+            if ignore_case:
+                texts = [text.lower() for text in texts]
+
+        self._text_columns[key] = (records, texts)
+        return records, texts
+
+    def _get_live_records(self, filename: str) -> List:
+        """Return the cached records of filename that are not soft-deleted"""
+        records = self._load_records(filename, self._struct_by_file[filename])[0]
+        cached = self._live_records.get(filename)
+        if cached is not None and cached[0] is records:
+            return cached[1]
+
+        live = [record for record in records if record[-1] == b'0']
+        self._live_records[filename] = (records, live)
+        return live
+
+    def _search_records(self, filename: str, field: int, keyword: str, ignore_case=True) -> List:
+        """Return the active records whose text field contains keyword (already lowercased if ignore_case)"""
+        if not ignore_case:
+            # UTF-8 substring ตรงกับ substring ของข้อความเสมอ จึงค้นใน bytes ดิบได้โดยไม่ต้องถอดรหัส
+            keyword_bytes = keyword.encode('utf-8')
+            records = self._load_records(filename, self._struct_by_file[filename])[0]
+            return [record for record in records
+                    if record[-1] == b'0' and keyword_bytes in record[field]]
+
+        records, texts = self._text_column(filename, field, ignore_case)
+        return [record for record, text in zip(records, texts)
+                if record[-1] == b'0' and keyword in text]
 
     def _decode_string(self, data: bytes) -> str:
-        return data.decode('utf-8').rstrip('\x00')
+        return decode_field(data)
+
+    def _iter_overdue_borrows(self):
+        """Yield (borrow, borrow_date, days_overdue) for active borrows past their 7-day due date"""
+        today = datetime.date.today()
+        # วันที่เก็บเป็น YYYY-MM-DD จึงเทียบแบบ bytes ได้ตรง: ยืมก่อน cutoff = เกินกำหนดแล้ว
+        cutoff = (today - datetime.timedelta(days=7)).isoformat().encode('ascii')
+        for _, borrow in self._iter_active_borrow_records():
+            if borrow[3] >= cutoff:
+                continue
+            # only rows that look overdue pay for a full parse (rejects malformed dates)
+            borrow_date = self._parse_ymd(self._decode_string(borrow[3]))
+            if borrow_date is not None:
+                yield borrow, borrow_date, (today - borrow_date).days - 7
 
     def _check_and_ban_overdue_members(self):
-        borrows = self._get_all_borrows()
-        current_date = datetime.date.today()
+        members, member_index_by_id = self._load_records(self.members_file, self._member_struct)
         banned_members = []
-
-        for borrow in borrows:
-            if borrow[5] == b'B' and borrow[6] == b'0':
-                borrow_date_str = self._decode_string(borrow[3])
-                try:
-                    borrow_date = datetime.datetime.strptime(borrow_date_str, "%Y-%m-%d").date()
-                    due_date = borrow_date + datetime.timedelta(days=7)
-                    days_overdue = (current_date - due_date).days
-
-                    if days_overdue > 0:
-                        member_id = self._decode_string(borrow[2])
-                        member = self._find_member_by_id(member_id)
-
-                        if member and member[5] == b'A':
-                            member_index = self._find_member_index_by_id(member_id)
-                            if member_index != -1:
-                                banned_member = struct.pack(
-                                    self.member_format,
-                                    member[0], member[1], member[2], member[3], member[4],
-                                    b'S',
-                                    member[6]
-                                )
-                                self._update_record(self.members_file, member_index, banned_member, self.member_size)
-
-                                if member_id not in banned_members:
-                                    banned_members.append(member_id)
-                except:
-                    pass
-
+        seen = set()
+        updates = []
+
+        for borrow, _, _ in self._iter_overdue_borrows():
+            if borrow[2] in seen:
+                continue
+            seen.add(borrow[2])
+
+            member_index = member_index_by_id.get(borrow[2])
+            if member_index is None:
+                continue
+            member = members[member_index]
+            if member[5] == b'A':
+                updates.append((member_index, member))
+                banned_members.append(self._decode_string(member[0]))
+
+        # เขียนทับเฉพาะไบต์สถานะของสมาชิกที่ถูกแบน
+        self._update_field(self.members_file, 5, b'S', updates)
         return banned_members
 
     # === BOOKS MANAGEMENT ===
@@ -207,7 +651,7 @@ class LibrarySystem:
                 print("\n❌ จำนวนหนังสือต้องเป็นตัวเลข 1-9999 เล่ม")
                 return
 
-            book_id = self._get_next_id(self.books_file, self.book_size)
+            book_id = self._get_next_id(self.books_file)
 
             # แสดงข้อมูลที่จะบันทึก
             print("\n" + "─" * 60)
@@ -225,20 +669,8 @@ class LibrarySystem:
                 print("\n❌ ยกเลิกการเพิ่มหนังสือ")
                 return
 
-            book_data = struct.pack(
-                self.book_format,
-                self._encode_string(book_id, 4),
-                self._encode_string(title, 100),
-                self._encode_string(author, 50),
-                self._encode_string(isbn, 20),
-                self._encode_string(str(year), 4),
-                self._encode_string(str(quantity), 4),
-                b'A',
-                b'0'
-            )
-
-            with open(self.books_file, 'ab') as f:
-                f.write(book_data)
+            self._pack_book_into(self._book_write_buf, book_id, title, author, isbn, year, quantity)
+            self._append_record(self.books_file, self._book_write_buf)
 
             print("\n✅ เพิ่มหนังสือเรียบร้อย!")
             print("─" * 60)
@@ -246,11 +678,26 @@ class LibrarySystem:
             print(f"📖 ชื่อหนังสือ: {title}")
             print(f"📚 จำนวน: {quantity} เล่ม")
             print(f"📝 บันทึกการดำเนินการ: เพิ่มหนังสือ '{title}' ID: {book_id} จำนวน {quantity} เล่ม")
-            self.operation_history.append(f"{datetime.datetime.now()}: เพิ่มหนังสือ '{title}' ID: {book_id} จำนวน {quantity} เล่ม")
+            self._log_operation('add_book', title, book_id, quantity)
 
         except Exception as e:
             print(f"\n❌ เกิดข้อผิดพลาด: {e}")
 
+    def _pack_book_into(self, buffer, book_id: str, title: str, author: str,
+                        isbn: str, year: int, quantity: int):
+        """Pack a new (active, not deleted) book record into buffer"""
+        self._book_struct.pack_into(
+            buffer, 0,
+            self._encode_string(book_id, 4),
+            self._encode_string(title, 100),
+            self._encode_string(author, 50),
+            self._encode_string(isbn, 20),
+            self._encode_number(year),
+            self._encode_number(quantity),
+            b'A',
+            b'0'
+        )
+
     def view_books(self):
         print("\n" + "=" * 60)
         print(" " * 20 + "📚 ดูข้อมูลหนังสือ 📚")
@@ -297,55 +744,56 @@ class LibrarySystem:
         print("📊 ดูข้อมูลหนังสือทั้งหมด")
         print("─" * 60)
         
-        books = self._get_all_books()
-        active_books = [book for book in books if book[7] == b'0']  # Updated index for deleted flag
+        active_books = self._get_live_records(self.books_file)
 
         if not active_books:
             print("\n📭 ไม่มีหนังสือในระบบ")
             return
 
+        # นับจำนวนที่ถูกยืมของทุกเล่มครั้งเดียว แทนการสแกนไฟล์ยืมต่อหนังสือหนึ่งเล่ม
+        borrowed_counts = self._get_borrowed_quantities()
+
         # Calculate total quantity and available quantity
         total_quantity = 0
         available_quantity = 0
         borrowed_quantity = 0
         
         for book in active_books:
-            try:
-                quantity = int(self._decode_string(book[5]))
-                total_quantity += quantity
-                
-                # Calculate available quantity for this book
-                book_id = self._decode_string(book[0])
-                book_borrowed = self._get_borrowed_quantity(book_id)
-                book_available = quantity - book_borrowed
-                available_quantity += book_available
-                borrowed_quantity += book_borrowed
-            except:
+            quantity = parse_quantity(book[5], None)
+            if quantity is None:
                 total_quantity += 1  # fallback for old records
                 available_quantity += 1
                 borrowed_quantity += 0
+                continue
 
-        print(f"\n📈 สรุปข้อมูล:")
-        print(f"📚 รายการหนังสือทั้งหมด: {len(active_books)} รายการ")
-        print(f"📖 จำนวนหนังสือรวม: {total_quantity} เล่ม")
-        print(f"📋 หนังสือว่าง: {available_quantity} เล่ม")
-        print(f"📚 หนังสือถูกยืม: {borrowed_quantity} เล่ม")
-        print("─" * 100)
-        print(f"{'ลำดับ':<4} | {'ID':<6} | {'ชื่อหนังสือ':<30} | {'ผู้แต่ง':<20} | {'จำนวน':<8} | {'สถานะ':<15}")
-        print("─" * 100)
+            total_quantity += quantity
+            
+            # Calculate available quantity for this book
+            book_borrowed = borrowed_counts[book[0]]
+            book_available = quantity - book_borrowed
+            available_quantity += book_available
+            borrowed_quantity += book_borrowed
+
+        # สร้างตารางทั้งหมดก่อนแล้วเขียนออกครั้งเดียว แทนการ print ทีละบรรทัด
+        out = []
+        out.append(f"\n📈 สรุปข้อมูล:")
+        out.append(f"📚 รายการหนังสือทั้งหมด: {len(active_books)} รายการ")
+        out.append(f"📖 จำนวนหนังสือรวม: {total_quantity} เล่ม")
+        out.append(f"📋 หนังสือว่าง: {available_quantity} เล่ม")
+        out.append(f"📚 หนังสือถูกยืม: {borrowed_quantity} เล่ม")
+        out.append("─" * 100)
+        out.append(f"{'ลำดับ':<4} | {'ID':<6} | {'ชื่อหนังสือ':<30} | {'ผู้แต่ง':<20} | {'จำนวน':<8} | {'สถานะ':<15}")
+        out.append("─" * 100)
 
         for idx, book in enumerate(active_books, 1):
             book_id = self._decode_string(book[0])
             title = self._decode_string(book[1])
             author = self._decode_string(book[2])
             
-            try:
-                quantity = int(self._decode_string(book[5]))
-            except:
-                quantity = 1  # fallback for old records
+            quantity = parse_quantity(book[5])
             
             # Calculate available quantity
-            borrowed_quantity_book = self._get_borrowed_quantity(book_id)
+            borrowed_quantity_book = borrowed_counts[book[0]]
             available_quantity_book = quantity - borrowed_quantity_book
             
             # Format status
@@ -355,11 +803,12 @@ class LibrarySystem:
                 status = "ถูกยืมหมด"
             
             # Format the line
-            print(f"{idx:<4} | {book_id:<6} | {title[:30]:<30} | {author[:20]:<20} | {quantity:>6} เล่ม | {status:<15}")
+            out.append(f"{idx:<4} | {book_id:<6} | {title:<30.30} | {author:<20.20} | {quantity:>6} เล่ม | {status:<15}")
 
-        print("─" * 100)
-        print(f"📅 ข้อมูลอัปเดตล่าสุด: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("─" * 100)
+        out.append("─" * 100)
+        out.append(f"📅 ข้อมูลอัปเดตล่าสุด: {format_timestamp(int(time.time()))}")
+        out.append("─" * 100)
+        sys.stdout.write('\n'.join(out) + '\n')
 
     def _view_filtered_books(self):
         print("\n" + "─" * 60)
@@ -383,102 +832,85 @@ class LibrarySystem:
             print("❌ กรุณากรอกคำค้นหา")
             return
 
-        books = self._get_all_books()
-        active_books = [book for book in books if book[7] == b'0']  # Updated index for deleted flag
-        filtered_books = []
-
-        for book in active_books:
-            if filter_choice == '1' and keyword in self._decode_string(book[1]).lower():
-                filtered_books.append(book)
-            elif filter_choice == '2' and keyword in self._decode_string(book[2]).lower():
-                filtered_books.append(book)
-            elif filter_choice == '3' and keyword in self._decode_string(book[4]):
-                filtered_books.append(book)
+        field = {'1': 1, '2': 2, '3': 4}[filter_choice]
+        filtered_books = self._search_records(self.books_file, field, keyword,
+                                              ignore_case=filter_choice != '3')
 
         if filtered_books:
             # Calculate total quantity for filtered books
             filtered_quantity = 0
             for book in filtered_books:
-                try:
-                    quantity_str = self._decode_string(book[5])
-                    quantity = int(quantity_str)
-                    filtered_quantity += quantity
-                except:
-                    filtered_quantity += 1  # fallback for old records
+                filtered_quantity += parse_quantity(book[5])
             
-            print(f"\n✅ พบหนังสือ {len(filtered_books)} รายการ")
-            print(f"📚 จำนวนหนังสือรวม: {filtered_quantity} เล่ม")
-            print("─" * 90)
-            print(f"{'ลำดับ':<6} | {'ชื่อหนังสือ':<25} | {'ผู้แต่ง':<15} | {'จำนวน':<8} | {'สถานะ':<10}")
-            print("─" * 90)
+            out = [
+                f"\n✅ พบหนังสือ {len(filtered_books)} รายการ",
+                f"📚 จำนวนหนังสือรวม: {filtered_quantity} เล่ม",
+                "─" * 90,
+                f"{'ลำดับ':<6} | {'ชื่อหนังสือ':<25} | {'ผู้แต่ง':<15} | {'จำนวน':<8} | {'สถานะ':<10}",
+                "─" * 90,
+            ]
+            borrowed_counts = self._get_borrowed_quantities()
             for idx, book in enumerate(filtered_books, 1):
-                self._display_book(book, compact=True, show_id=False, sequence=idx)
+                out.append(self._compact_book_line(book, show_id=False, sequence=idx,
+                                                   borrowed_counts=borrowed_counts))
+            sys.stdout.write('\n'.join(out) + '\n')
         else:
             print(f"\n❌ ไม่พบหนังสือที่ตรงกับเงื่อนไข: '{keyword}'")
             print("💡 ลองใช้คำค้นหาอื่น หรือตรวจสอบการสะกด")
 
     def _find_book_by_id(self, book_id: str):
-        books = self._get_all_books()
-        for book in books:
-            if self._decode_string(book[0]) == book_id and book[7] == b'0':  # Updated index for deleted flag
-                return book
-        return None
+        records, id_index = self._load_records(self.books_file, self._book_struct)
+        index = id_index.get(self._encode_id(book_id))
+        return records[index] if index is not None else None
 
     def _get_all_books(self) -> List:
-        books = []
-        if not os.path.exists(self.books_file):
-            return books
-
-        with open(self.books_file, 'rb') as f:
-            while True:
-                data = f.read(self.book_size)
-                if not data:
-                    break
-                if len(data) != self.book_size:
-                    # Skip incomplete records
-                    break
-                try:
-                    book = struct.unpack(self.book_format, data)
-                    books.append(book)
-                except struct.error:
-                    # Skip corrupted records
-                    continue
-        return books
+        return self._load_records(self.books_file, self._book_struct)[0]
+
+    def _compact_book_line(self, book, show_id=True, sequence=None, borrowed_counts=None) -> str:
+        """One-line book summary; pass borrowed_counts when formatting many books"""
+        book_id = self._decode_string(book[0])
+        title = self._decode_string(book[1])
+        author = self._decode_string(book[2])
+        quantity = parse_quantity(book[5])
+
+        if borrowed_counts is not None:
+            borrowed_quantity = borrowed_counts[book[0]]
+        else:
+            borrowed_quantity = self._get_borrowed_quantity(book_id)
+        available_quantity = quantity - borrowed_quantity
+
+        if show_id:
+            return f"ID: {book_id} | {title:<25.25} | {author:<15.15} | {quantity} เล่ม | {available_quantity} ว่าง"
+        return f"{sequence:<6} | {title:<25.25} | {author:<15.15} | {quantity} เล่ม | {available_quantity} ว่าง"
 
     def _display_book(self, book, compact=False, show_id=True, sequence=None):
+        if compact:
+            print(self._compact_book_line(book, show_id, sequence))
+            return
+
         book_id = self._decode_string(book[0])
         title = self._decode_string(book[1])
         author = self._decode_string(book[2])
         isbn = self._decode_string(book[3])
         year = self._decode_string(book[4])
-        quantity_str = self._decode_string(book[5])
-        try:
-            quantity = int(quantity_str)
-        except:
-            quantity = 1  # fallback for old records
+        quantity = parse_quantity(book[5])
         
         # Calculate available quantity
         borrowed_quantity = self._get_borrowed_quantity(book_id)
         available_quantity = quantity - borrowed_quantity
 
-        if compact:
-            if show_id:
-                print(f"ID: {book_id} | {title[:25]:<25} | {author[:15]:<15} | {quantity} เล่ม | {available_quantity} ว่าง")
-            else:
-                print(f"{sequence:<6} | {title[:25]:<25} | {author[:15]:<15} | {quantity} เล่ม | {available_quantity} ว่าง")
-        else:
-            print("┌" + "─" * 50 + "┐")
-            print(f"│ {'ข้อมูลหนังสือ':^52} │")
-            print("├" + "─" * 50 + "┤")
-            print(f"│ ID: {book_id:<44} │")
-            print(f"│ ชื่อ: {title[:42]:<44} │")
-            print(f"│ ผู้แต่ง: {author[:40]:<42} │")
-            print(f"│ ISBN: {isbn[:43]:<42} │")
-            print(f"│ ปีที่พิมพ์: {year:<41} │")
-            print(f"│ จำนวนรวม: {quantity} เล่ม{'':<33} │")
-            print(f"│ จำนวนที่ว่าง: {available_quantity} เล่ม{'':<32} │")
-            print(f"│ จำนวนที่ถูกยืม: {borrowed_quantity} เล่ม{'':<31} │")
-            print("└" + "─" * 50 + "┘")
+        print("┌" + "─" * 50 + "┐")
+        print(f"│ {'ข้อมูลหนังสือ':^52} │")
+        print("├" + "─" * 50 + "┤")
+        print(f"│ ID: {book_id:<44} │")
+        print(f"│ ชื่อ: {title:<44.42} │")
+        print(f"│ ผู้แต่ง: {author:<42.40} │")
+        print(f"│ ISBN: {isbn:<42.43} │")
+        print(f"│ ปีที่พิมพ์: {year:<41} │")
+        print(f"│ จำนวนรวม: {quantity} เล่ม{'':<33} │")
+        print(f"│ จำนวนที่ว่าง: {available_quantity} เล่ม{'':<32} │")
+        print(f"│ จำนวนที่ถูกยืม: {borrowed_quantity} เล่ม{'':<31} │")
+        print("└" + "─" * 50 + "┘")
 
     def update_book(self):
         print("\n" + "=" * 60)
@@ -536,7 +968,7 @@ class LibrarySystem:
         current_quantity = self._decode_string(book[5])
         try:
             current_quantity_int = int(current_quantity)
-        except:
+        except ValueError:
             current_quantity_int = 1  # fallback for old records
             current_quantity = "1"
 
@@ -567,22 +999,22 @@ class LibrarySystem:
             print("\n❌ ยกเลิกการแก้ไข")
             return
 
-        updated_book = struct.pack(
-            self.book_format,
+        self._book_struct.pack_into(
+            self._book_write_buf, 0,
             book[0],
             self._encode_string(title, 100),
             self._encode_string(author, 50),
             self._encode_string(isbn, 20),
-            self._encode_string(str(year), 4),
-            self._encode_string(str(quantity), 4),
+            self._encode_number(year),
+            self._encode_number(quantity),
             book[6],
             book[7]
         )
 
-        self._update_record(self.books_file, book_index, updated_book, self.book_size)
+        self._update_record(self.books_file, book_index, self._book_write_buf)
         print("\n✅ แก้ไขข้อมูลหนังสือเรียบร้อย!")
         print(f"📝 บันทึกการดำเนินการ: แก้ไขหนังสือ ID: {book_id}")
-        self.operation_history.append(f"{datetime.datetime.now()}: แก้ไขหนังสือ ID: {book_id}")
+        self._log_operation('update_book', book_id)
 
     def delete_book(self):
         print("\n" + "=" * 60)
@@ -618,59 +1050,61 @@ class LibrarySystem:
             print("\n❌ ยกเลิกการลบหนังสือ")
             return
 
-        deleted_book = struct.pack(
-            self.book_format,
-            book[0], book[1], book[2], book[3], book[4], book[5], book[6],
-            b'1'
-        )
-
-        self._update_record(self.books_file, book_index, deleted_book, self.book_size)
+        self._update_field(self.books_file, 7, b'1', [(book_index, book)])
         print("\n✅ ลบหนังสือเรียบร้อย!")
         print("─" * 60)
         print(f"🆔 ID: {book_id}")
         print(f"📖 ชื่อหนังสือ: {self._decode_string(book[1])}")
         print(f"📝 บันทึกการดำเนินการ: ลบหนังสือ ID: {book_id}")
-        self.operation_history.append(f"{datetime.datetime.now()}: ลบหนังสือ ID: {book_id}")
+        self._log_operation('delete_book', book_id)
 
     def _find_book_index_by_id(self, book_id: str) -> int:
-        if not os.path.exists(self.books_file):
-            return -1
-
-        with open(self.books_file, 'rb') as f:
-            index = 0
-            while True:
-                data = f.read(self.book_size)
-                if not data:
-                    break
-                if len(data) != self.book_size:
-                    break
-                try:
-                    book = struct.unpack(self.book_format, data)
-                    if self._decode_string(book[0]) == book_id and book[7] == b'0':  # Updated index for deleted flag
-                        return index
-                except struct.error:
-                    pass
-                index += 1
-        return -1
+        return self._load_records(self.books_file, self._book_struct)[1].get(self._encode_id(book_id), -1)
 
     def _get_book_by_index(self, index: int):
-        if not os.path.exists(self.books_file):
-            return None
-
-        with open(self.books_file, 'rb') as f:
-            f.seek(index * self.book_size)
-            data = f.read(self.book_size)
-            if not data or len(data) != self.book_size:
-                return None
-            try:
-                return struct.unpack(self.book_format, data)
-            except struct.error:
-                return None
+        records = self._load_records(self.books_file, self._book_struct)[0]
+        return records[index] if 0 <= index < len(records) else None
+
+    def _update_record(self, filename: str, index: int, data):
+        record_size = self._struct_by_file[filename].size
+        self._write_at(self._get_rw_fd(filename), data, index * record_size)
+        self._patch_cache(filename, [(index, data)])
+
+    def _update_records(self, filename: str, updates: List[Tuple[int, bytes]]):
+        """Write several (index, data) updates, joining adjacent records into one write"""
+        if not updates:
+            return
+
+        record_size = self._struct_by_file[filename].size
+        fd = self._get_rw_fd(filename)
+        updates = sorted(updates, key=lambda update: update[0])
+        run_start = None
+        run = []
+        for index, data in updates:
+            if run and index == run_start + len(run):
+                run.append(data)
+                continue
+            if run:
+                self._write_at(fd, b''.join(run), run_start * record_size)
+            run_start = index
+            run = [data]
+        if run:
+            self._write_at(fd, b''.join(run), run_start * record_size)
+        self._patch_cache(filename, updates)
+
+    def _update_field(self, filename: str, field: int, value: bytes, targets):
+        """Overwrite one fixed-width field of each (index, record) in targets in place"""
+        if not targets:
+            return
 
-    def _update_record(self, filename: str, index: int, data: bytes, record_size: int):
-        with open(filename, 'r+b') as f:
-            f.seek(index * record_size)
-            f.write(data)
+        fd = self._get_rw_fd(filename)
+        record_size = self._struct_by_file[filename].size
+        offset = self._field_offsets_by_file[filename][field]
+        placed = []
+        for index, record in targets:
+            self._write_at(fd, value, index * record_size + offset)
+            placed.append((index, record[:field] + (value,) + record[field + 1:]))
+        self._patch_cached_records(filename, placed)
 
     # === MEMBERS MANAGEMENT ===
     def add_member(self):
@@ -690,7 +1124,7 @@ class LibrarySystem:
             email = input("📧 อีเมล: ").strip()
             phone = input("📱 โทรศัพท์: ").strip()
 
-            member_id = self._get_next_id(self.members_file, self.member_size)
+            member_id = self._get_next_id(self.members_file)
             join_date = datetime.date.today().strftime("%Y-%m-%d")
 
             # แสดงข้อมูลที่จะบันทึก
@@ -708,19 +1142,8 @@ class LibrarySystem:
                 print("\n❌ ยกเลิกการเพิ่มสมาชิก")
                 return
 
-            member_data = struct.pack(
-                self.member_format,
-                self._encode_string(member_id, 4),
-                self._encode_string(name, 50),
-                self._encode_string(email, 50),
-                self._encode_string(phone, 15),
-                self._encode_string(join_date, 10),
-                b'A',
-                b'0'
-            )
-
-            with open(self.members_file, 'ab') as f:
-                f.write(member_data)
+            new_member = self._pack_member(member_id, name, email, phone, join_date)
+            self._append_record(self.members_file, new_member)
 
             print("\n✅ เพิ่มสมาชิกเรียบร้อย!")
             print("─" * 60)
@@ -728,11 +1151,23 @@ class LibrarySystem:
             print(f"👤 ชื่อ-นามสกุล: {name}")
             print(f"📅 วันที่สมัคร: {join_date}")
             print(f"📝 บันทึกการดำเนินการ: เพิ่มสมาชิก '{name}' ID: {member_id}")
-            self.operation_history.append(f"{datetime.datetime.now()}: เพิ่มสมาชิก '{name}' ID: {member_id}")
+            self._log_operation('add_member', name, member_id)
 
         except Exception as e:
             print(f"\n❌ เกิดข้อผิดพลาด: {e}")
 
+    def _pack_member(self, member_id: str, name: str, email: str, phone: str, join_date: str) -> bytes:
+        """Pack a new (active, not deleted) member record"""
+        return self._member_struct.pack(
+            self._encode_string(member_id, 4),
+            self._encode_string(name, 50),
+            self._encode_string(email, 50),
+            self._encode_string(phone, 15),
+            self._encode_string(join_date, 10),
+            b'A',
+            b'0'
+        )
+
     def view_members(self):
         print("\n" + "=" * 60)
         print(" " * 20 + "👥 ดูข้อมูลสมาชิก 👥")
@@ -779,21 +1214,22 @@ class LibrarySystem:
         print("📊 ดูข้อมูลสมาชิกทั้งหมด")
         print("─" * 60)
         
-        members = self._get_all_members()
-        active_members = [member for member in members if member[6] == b'0']
+        active_members = self._get_live_records(self.members_file)
 
         if not active_members:
             print("\n📭 ไม่มีสมาชิกในระบบ")
             return
 
-        print(f"\n📈 สรุปข้อมูล:")
-        print(f"👥 จำนวนสมาชิกทั้งหมด: {len(active_members)} คน")
-        print("─" * 80)
-        print(f"{'ลำดับ':<4} | {'ID':<6} | {'ชื่อ-นามสกุล':<25} | {'อีเมล':<30} | {'สถานะ':<15}")
-        print("─" * 80)
-        
+        out = [
+            f"\n📈 สรุปข้อมูล:",
+            f"👥 จำนวนสมาชิกทั้งหมด: {len(active_members)} คน",
+            "─" * 80,
+            f"{'ลำดับ':<4} | {'ID':<6} | {'ชื่อ-นามสกุล':<25} | {'อีเมล':<30} | {'สถานะ':<15}",
+            "─" * 80,
+        ]
         for idx, member in enumerate(active_members, 1):
-            self._display_member(member, compact=True, sequence=idx)
+            out.append(self._format_member(member, compact=True, sequence=idx))
+        sys.stdout.write('\n'.join(out) + '\n')
 
     def _view_filtered_members(self):
         print("\n" + "─" * 60)
@@ -816,53 +1252,35 @@ class LibrarySystem:
             print("❌ กรุณากรอกคำค้นหา")
             return
 
-        members = self._get_all_members()
-        active_members = [member for member in members if member[6] == b'0']
-        filtered_members = []
-
-        for member in active_members:
-            if filter_choice == '1' and keyword in self._decode_string(member[1]).lower():
-                filtered_members.append(member)
-            elif filter_choice == '2' and keyword in self._decode_string(member[2]).lower():
-                filtered_members.append(member)
+        field = 1 if filter_choice == '1' else 2
+        filtered_members = self._search_records(self.members_file, field, keyword)
 
         if filtered_members:
-            print(f"\n✅ พบสมาชิก {len(filtered_members)} คน")
-            print("─" * 80)
-            print(f"{'ลำดับ':<4} | {'ID':<6} | {'ชื่อ-นามสกุล':<25} | {'อีเมล':<30} | {'สถานะ':<15}")
-            print("─" * 80)
+            out = [
+                f"\n✅ พบสมาชิก {len(filtered_members)} คน",
+                "─" * 80,
+                f"{'ลำดับ':<4} | {'ID':<6} | {'ชื่อ-นามสกุล':<25} | {'อีเมล':<30} | {'สถานะ':<15}",
+                "─" * 80,
+            ]
             for idx, member in enumerate(filtered_members, 1):
-                self._display_member(member, compact=True, sequence=idx)
+                out.append(self._format_member(member, compact=True, sequence=idx))
+            sys.stdout.write('\n'.join(out) + '\n')
         else:
             print(f"\n❌ ไม่พบสมาชิกที่ตรงกับเงื่อนไข: '{keyword}'")
             print("💡 ลองใช้คำค้นหาอื่น หรือตรวจสอบการสะกด")
 
     def _find_member_by_id(self, member_id: str):
-        members = self._get_all_members()
-        for member in members:
-            if self._decode_string(member[0]) == member_id and member[6] == b'0':
-                return member
-        return None
+        records, id_index = self._load_records(self.members_file, self._member_struct)
+        index = id_index.get(self._encode_id(member_id))
+        return records[index] if index is not None else None
 
     def _get_all_members(self) -> List:
-        members = []
-        if not os.path.exists(self.members_file):
-            return members
-        with open(self.members_file, 'rb') as f:
-            while True:
-                data = f.read(self.member_size)
-                if not data:
-                    break
-                member = struct.unpack(self.member_format, data)
-                members.append(member)
-        return members
+        return self._load_records(self.members_file, self._member_struct)[0]
 
-    def _display_member(self, member, compact=False, sequence=None):
+    def _format_member(self, member, compact=False, sequence=None) -> str:
         member_id = self._decode_string(member[0])
         name = self._decode_string(member[1])
         email = self._decode_string(member[2])
-        phone = self._decode_string(member[3])
-        join_date = self._decode_string(member[4])
 
         if member[5] == b'A':
             status = 'ใช้งาน'
@@ -873,20 +1291,26 @@ class LibrarySystem:
 
         if compact:
             if sequence:
-                print(f"{sequence:<4} | {member_id:<6} | {name[:25]:<25} | {email[:30]:<30} | {status:<15}")
-            else:
-                print(f"ID: {member_id} | {name[:25]:<25} | {email[:30]:<30} | {status}")
-        else:
-            print("┌" + "─" * 50 + "┐")
-            print(f"│ {'ข้อมูลสมาชิก':^48} │")
-            print("├" + "─" * 50 + "┤")
-            print(f"│ ID: {member_id:<44} │")
-            print(f"│ ชื่อ-นามสกุล: {name[:38]:<38} │")
-            print(f"│ อีเมล: {email[:41]:<41} │")
-            print(f"│ โทรศัพท์: {phone[:39]:<39} │")
-            print(f"│ วันที่สมัคร: {join_date:<36} │")
-            print(f"│ สถานะ: {status:<42} │")
-            print("└" + "─" * 50 + "┘")
+                return f"{sequence:<4} | {member_id:<6} | {name:<25.25} | {email:<30.30} | {status:<15}"
+            return f"ID: {member_id} | {name:<25.25} | {email:<30.30} | {status}"
+
+        phone = self._decode_string(member[3])
+        join_date = self._decode_string(member[4])
+        return "\n".join([
+            "┌" + "─" * 50 + "┐",
+            f"│ {'ข้อมูลสมาชิก':^48} │",
+            "├" + "─" * 50 + "┤",
+            f"│ ID: {member_id:<44} │",
+            f"│ ชื่อ-นามสกุล: {name:<38.38} │",
+            f"│ อีเมล: {email:<41.41} │",
+            f"│ โทรศัพท์: {phone:<39.39} │",
+            f"│ วันที่สมัคร: {join_date:<36} │",
+            f"│ สถานะ: {status:<42} │",
+            "└" + "─" * 50 + "┘",
+        ])
+
+    def _display_member(self, member, compact=False, sequence=None):
+        sys.stdout.write(self._format_member(member, compact, sequence) + "\n")
 
     def update_member(self):
         print("\n=== แก้ไขสมาชิก ===")
@@ -919,8 +1343,7 @@ class LibrarySystem:
         if not phone:
             phone = self._decode_string(member[3])
 
-        updated_member = struct.pack(
-            self.member_format,
+        updated_member = self._member_struct.pack(
             member[0],
             self._encode_string(name, 50),
             self._encode_string(email, 50),
@@ -930,9 +1353,9 @@ class LibrarySystem:
             member[6]
         )
 
-        self._update_record(self.members_file, member_index, updated_member, self.member_size)
+        self._update_record(self.members_file, member_index, updated_member)
         print("แก้ไขข้อมูลสมาชิกเรียบร้อย")
-        self.operation_history.append(f"{datetime.datetime.now()}: แก้ไขสมาชิก ID: {member_id}")
+        self._log_operation('update_member', member_id)
 
     def delete_member(self):
         print("\n=== ลบสมาชิก ===")
@@ -956,42 +1379,16 @@ class LibrarySystem:
             print("ยกเลิกการลบ")
             return
 
-        deleted_member = struct.pack(
-            self.member_format,
-            member[0], member[1], member[2], member[3], member[4], member[5],
-            b'1'
-        )
-
-        self._update_record(self.members_file, member_index, deleted_member, self.member_size)
+        self._update_field(self.members_file, 6, b'1', [(member_index, member)])
         print("ลบสมาชิกเรียบร้อย")
-        self.operation_history.append(f"{datetime.datetime.now()}: ลบสมาชิก ID: {member_id}")
+        self._log_operation('delete_member', member_id)
 
     def _find_member_index_by_id(self, member_id: str) -> int:
-        if not os.path.exists(self.members_file):
-            return -1
-
-        with open(self.members_file, 'rb') as f:
-            index = 0
-            while True:
-                data = f.read(self.member_size)
-                if not data:
-                    break
-                member = struct.unpack(self.member_format, data)
-                if self._decode_string(member[0]) == member_id and member[6] == b'0':
-                    return index
-                index += 1
-        return -1
+        return self._load_records(self.members_file, self._member_struct)[1].get(self._encode_id(member_id), -1)
 
     def _get_member_by_index(self, index: int):
-        if not os.path.exists(self.members_file):
-            return None
-
-        with open(self.members_file, 'rb') as f:
-            f.seek(index * self.member_size)
-            data = f.read(self.member_size)
-            if not data:
-                return None
-            return struct.unpack(self.member_format, data)
+        records = self._load_records(self.members_file, self._member_struct)[0]
+        return records[index] if 0 <= index < len(records) else None
 
     # === BORROW MANAGEMENT ===
     def add_borrow(self):
@@ -1103,24 +1500,31 @@ class LibrarySystem:
             due_date_str = due_date.strftime("%Y-%m-%d")
 
             # สร้างรายการยืมสำหรับแต่ละเล่ม
+            # ID ต่อเนื่องกัน จึงอ่านท้ายไฟล์ครั้งเดียวแล้วเขียนทุกเล่มในครั้งเดียว
+            first_id = int(self._get_next_id(self.borrows_file))
             borrow_ids = []
+            buffer = bytearray(borrow_quantity * self.borrow_size)
+            # ฟิลด์อื่นเหมือนกันทุกเล่ม เข้ารหัสครั้งเดียวนอกลูป
+            encoded_book_id = self._encode_string(selected_book_id, 4)
+            encoded_member_id = self._encode_string(member_id, 4)
+            encoded_borrow_date = self._encode_string(borrow_date_str, 10)
+            encoded_return_date = self._encode_string("", 10)
             for i in range(borrow_quantity):
-                borrow_id = self._get_next_id(self.borrows_file, self.borrow_size)
+                borrow_id = f"{first_id + i:04d}"
                 borrow_ids.append(borrow_id)
 
-                borrow_data = struct.pack(
-                    self.borrow_format,
+                self._borrow_struct.pack_into(
+                    buffer, i * self.borrow_size,
                     self._encode_string(borrow_id, 4),
-                    self._encode_string(selected_book_id, 4),
-                    self._encode_string(member_id, 4),
-                    self._encode_string(borrow_date_str, 10),
-                    self._encode_string("", 10),
+                    encoded_book_id,
+                    encoded_member_id,
+                    encoded_borrow_date,
+                    encoded_return_date,
                     b'B',
                     b'0'
                 )
 
-                with open(self.borrows_file, 'ab') as f:
-                    f.write(borrow_data)
+            self._append_record(self.borrows_file, buffer)
 
             print("\n" + "=" * 60)
             print("✅ ยืมหนังสือสำเร็จ!")
@@ -1144,9 +1548,7 @@ class LibrarySystem:
             print("• สามารถคืนหนังสือทีละเล่มหรือทั้งหมดพร้อมกันได้")
             print("=" * 60)
 
-            self.operation_history.append(
-                f"{datetime.datetime.now()}: ยืมหนังสือ '{selected_title}' {borrow_quantity} เล่ม (รหัส: {', '.join(borrow_ids)}) โดยสมาชิก ID: {member_id}"
-            )
+            self._log_operation('borrow', selected_title, borrow_quantity, ', '.join(borrow_ids), member_id)
 
         except Exception as e:
             print(f"\n❌ เกิดข้อผิดพลาด: {e}")
@@ -1161,18 +1563,19 @@ class LibrarySystem:
                 print("ไม่พบสมาชิก")
                 return
 
-            # แสดงรายการหนังสือที่สมาชิกยืมอยู่
-            active_borrows = self._get_member_active_borrows(member_id)
+            # แสดงรายการหนังสือที่สมาชิกยืมอยู่ (เก็บตำแหน่งในไฟล์ไว้ใช้ตอนอัปเดต ไม่ต้องค้นซ้ำ)
+            active_borrows = self._get_member_active_borrow_records(member_id)
             if not active_borrows:
                 print("ไม่พบหนังสือที่ยืมอยู่")
                 return
 
             # จัดกลุ่มรายการยืมตามหนังสือ
-            book_borrow_groups = {}
-            for borrow_id, book_id, borrow_date_str in active_borrows:
-                if book_id not in book_borrow_groups:
-                    book_borrow_groups[book_id] = []
-                book_borrow_groups[book_id].append((borrow_id, borrow_date_str))
+            book_borrow_groups = defaultdict(list)
+            for borrow_index, borrow in active_borrows:
+                book_id = self._decode_string(borrow[1])
+                book_borrow_groups[book_id].append(
+                    (self._decode_string(borrow[0]), self._decode_string(borrow[3]), borrow_index, borrow)
+                )
 
             print(f"\n📚 รายการหนังสือที่ยืมอยู่ของ: {self._decode_string(member[1])}")
             print("-" * 100)
@@ -1228,31 +1631,30 @@ class LibrarySystem:
             return_date_str = return_date.strftime("%Y-%m-%d")
 
             borrow_date_str = selected_borrow_list[0][1]  # ใช้วันที่ยืมของเล่มแรก
-            borrow_date = datetime.datetime.strptime(borrow_date_str, "%Y-%m-%d").date()
+            borrow_date = self._parse_ymd(borrow_date_str)
+            if borrow_date is None:
+                raise ValueError(f"วันที่ยืมไม่ถูกต้อง: {borrow_date_str!r}")
             due_date = borrow_date + datetime.timedelta(days=7)
             days_overdue = (return_date - due_date).days
 
             # อัปเดตรายการยืมที่เลือก
             returned_borrow_ids = []
-            for i in range(return_count):
-                borrow_id = selected_borrow_list[i][0]
+            updates = []
+            encoded_return_date = self._encode_string(return_date_str, 10)
+            for borrow_id, _, borrow_index, borrow in selected_borrow_list[:return_count]:
                 returned_borrow_ids.append(borrow_id)
-                
-                borrow_index = self._find_borrow_index_by_id(borrow_id)
-                if borrow_index != -1:
-                    borrow = self._get_borrow_by_index(borrow_index)
-                    if borrow:
-                        updated_borrow = struct.pack(
-                            self.borrow_format,
-                            borrow[0],
-                            borrow[1],
-                            borrow[2],
-                            borrow[3],
-                            self._encode_string(return_date_str, 10),
-                            b'R',
-                            borrow[6]
-                        )
-                        self._update_record(self.borrows_file, borrow_index, updated_borrow, self.borrow_size)
+                updated_borrow = self._borrow_struct.pack(
+                    borrow[0],
+                    borrow[1],
+                    borrow[2],
+                    borrow[3],
+                    encoded_return_date,
+                    b'R',
+                    borrow[6]
+                )
+                updates.append((borrow_index, updated_borrow))
+
+            self._update_records(self.borrows_file, updates)
 
             print("\n" + "=" * 60)
             print("✓ คืนหนังสือเรียบร้อย")
@@ -1276,11 +1678,15 @@ class LibrarySystem:
             else:
                 print(f"\n✓ คืนก่อนกำหนด {abs(days_overdue)} วัน")
 
-            # ตรวจสอบว่ายังมีหนังสือค้างอยู่หรือไม่
-            remaining_borrows = self._get_member_active_borrows(member_id)
+            # ตรวจสอบว่ายังมีหนังสือค้างอยู่หรือไม่ (จากรายการที่โหลดไว้ตอนต้น ไม่ต้องสร้างดัชนีการยืมใหม่)
+            returned_indices = {borrow_index for borrow_index, _ in updates}
             has_overdue = False
-            for borrow_id, book_id, borrow_date_str in remaining_borrows:
-                borrow_date_temp = datetime.datetime.strptime(borrow_date_str, "%Y-%m-%d").date()
+            for borrow_index, borrow in active_borrows:
+                if borrow_index in returned_indices:
+                    continue
+                borrow_date_temp = self._parse_ymd(self._decode_string(borrow[3]))
+                if borrow_date_temp is None:
+                    continue
                 due_date_temp = borrow_date_temp + datetime.timedelta(days=7)
                 if (return_date - due_date_temp).days > 0:
                     has_overdue = True
@@ -1290,19 +1696,13 @@ class LibrarySystem:
             if not has_overdue and member and member[5] == b'S':
                 member_index = self._find_member_index_by_id(member_id)
                 if member_index != -1:
-                    unban_member = struct.pack(
-                        self.member_format,
-                        member[0], member[1], member[2], member[3], member[4],
-                        b'A',
-                        member[6]
-                    )
-                    self._update_record(self.members_file, member_index, unban_member, self.member_size)
+                    self._update_field(self.members_file, 5, b'A', [(member_index, member)])
                     print("\n✓ ยกเลิกการแบน ID สมาชิกเรียบร้อย")
                     print("  สามารถยืมหนังสือได้ตามปกติ")
 
             print("=" * 60)
 
-            self.operation_history.append(f"{datetime.datetime.now()}: คืนหนังสือ '{book_title}' {return_count} เล่ม (รหัส: {', '.join(returned_borrow_ids)}) โดยสมาชิก ID: {member_id}")
+            self._log_operation('return', book_title, return_count, ', '.join(returned_borrow_ids), member_id)
 
         except Exception as e:
             print(f"เกิดข้อผิดพลาด: {e}")
@@ -1338,8 +1738,7 @@ class LibrarySystem:
             print("ไม่พบรายการยืม")
 
     def _view_all_borrows(self):
-        borrows = self._get_all_borrows()
-        active_borrows = [borrow for borrow in borrows if borrow[6] == b'0']
+        active_borrows = self._get_live_records(self.borrows_file)
 
         if not active_borrows:
             print("\n" + "=" * 60)
@@ -1350,27 +1749,25 @@ class LibrarySystem:
             return
 
         # Count different types of borrows
-        current_borrows = [borrow for borrow in active_borrows if borrow[5] == b'B']
-        returned_borrows = [borrow for borrow in active_borrows if borrow[5] == b'R']
+        status_counts = Counter(map(itemgetter(5), active_borrows))
 
         print("\n" + "=" * 96)
         print("📋 รายการยืมทั้งหมด (All Borrow Records)")
         print("=" * 96)
         print(f"📊 สรุปข้อมูล:")
         print(f"  • รายการยืมทั้งหมด: {len(active_borrows)} รายการ")
-        print(f"  • กำลังยืมอยู่: {len(current_borrows)} รายการ")
-        print(f"  • คืนแล้ว: {len(returned_borrows)} รายการ")
+        print(f"  • กำลังยืมอยู่: {status_counts[b'B']} รายการ")
+        print(f"  • คืนแล้ว: {status_counts[b'R']} รายการ")
         print("=" * 96)
         print("📝 รายละเอียดรายการยืม:")
         print("-" * 96)
         print(f"| {'Borrow ID':<6} | {'Title':<25} | {'Member name':<15} | {'Member id':<8} | {'Borrow date':<10} | {'Status':<10}")
         print("-" * 96)
 
-        for borrow in active_borrows:
-            self._display_borrow(borrow, compact=True)
+        self._display_borrow_rows(active_borrows)
 
         print("-" * 96)
-        print("📅 ข้อมูลอัปเดตล่าสุด:", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        print("📅 ข้อมูลอัปเดตล่าสุด:", format_timestamp(int(time.time())))
         print("=" * 96)
 
     def _view_active_borrows(self):
@@ -1382,24 +1779,25 @@ class LibrarySystem:
             return
 
         # Group borrows by book and member
-        book_member_groups = {}
+        book_member_groups = defaultdict(list)
         for borrow in active_borrows:
             book_id = self._decode_string(borrow[1])
             member_id = self._decode_string(borrow[2])
             key = (book_id, member_id)
-            if key not in book_member_groups:
-                book_member_groups[key] = []
             book_member_groups[key].append(borrow)
 
         print(f"\nมีหนังสือที่ยืมอยู่ {len(active_borrows)} รายการ")
         print(f"จำนวนหนังสือที่ถูกยืม: {len(active_borrows)} เล่ม")
         print("-" * 110)
 
+        out = []
+        book_lookup = self._record_lookup(self.books_file)
+        member_lookup = self._record_lookup(self.members_file)
         for (book_id, member_id), borrow_list in book_member_groups.items():
             # ใช้ข้อมูลจาก borrow แรก
             borrow = borrow_list[0]
-            book = self._find_book_by_id(book_id)
-            member = self._find_member_by_id(member_id)
+            book = book_lookup(borrow[1])
+            member = member_lookup(borrow[2])
             
             book_title = self._decode_string(book[1]) if book else f"Book ID: {book_id}"
             member_name = self._decode_string(member[1]) if member else f"Member ID: {member_id}"
@@ -1407,12 +1805,13 @@ class LibrarySystem:
             borrow_date_str = self._decode_string(borrow[3])
             borrow_count = len(borrow_list)
             
-            print(f"หนังสือ: {book_title}")
-            print(f"ผู้ยืม: {member_name} (ID: {member_id})")
-            print(f"จำนวนที่ยืม: {borrow_count} เล่ม")
-            print(f"วันที่ยืม: {borrow_date_str}")
-            print(f"รหัสรายการยืม: {', '.join([self._decode_string(b[0]) for b in borrow_list])}")
-            print("-" * 110)
+            out.append(f"หนังสือ: {book_title}")
+            out.append(f"ผู้ยืม: {member_name} (ID: {member_id})")
+            out.append(f"จำนวนที่ยืม: {borrow_count} เล่ม")
+            out.append(f"วันที่ยืม: {borrow_date_str}")
+            out.append(f"รหัสรายการยืม: {', '.join([self._decode_string(b[0]) for b in borrow_list])}")
+            out.append("-" * 110)
+        sys.stdout.write('\n'.join(out) + '\n')
 
     def _view_member_borrow_history(self):
         member_id = input("กรอก ID สมาชิก: ").strip()
@@ -1422,9 +1821,9 @@ class LibrarySystem:
             print("ไม่พบสมาชิก")
             return
 
-        borrows = self._get_all_borrows()
-        member_borrows = [borrow for borrow in borrows 
-                         if self._decode_string(borrow[2]) == member_id and borrow[6] == b'0']
+        # ประวัติทั้งหมดของสมาชิก (ไม่นับที่ถูกลบ) แบ่งกลุ่มไว้แล้วพร้อมดัชนีการยืม
+        self._refresh_active_borrow_indexes()
+        member_borrows = self._borrows_by_member.get(self._encode_id(member_id), ())
 
         if not member_borrows:
             print("ไม่มีประวัติการยืม")
@@ -1434,101 +1833,69 @@ class LibrarySystem:
         print(f"จำนวนรายการ: {len(member_borrows)}")
         print("-" * 110)
 
-        for borrow in member_borrows:
-            self._display_borrow(borrow, compact=True)
+        self._display_borrow_rows(member_borrows)
 
     def _view_overdue_borrows(self):
         print("\n=== รายการเกินกำหนดคืน ===")
 
-        borrows = self._get_all_borrows()
-        current_date = datetime.date.today()
-        overdue_list = []
-
-        for borrow in borrows:
-            if borrow[5] == b'B' and borrow[6] == b'0':
-                borrow_date_str = self._decode_string(borrow[3])
-                try:
-                    borrow_date = datetime.datetime.strptime(borrow_date_str, "%Y-%m-%d").date()
-                    due_date = borrow_date + datetime.timedelta(days=7)
-                    days_overdue = (current_date - due_date).days
-
-                    if days_overdue > 0:
-                        overdue_list.append((borrow, days_overdue))
-                except:
-                    pass
+        overdue_list = list(self._iter_overdue_borrows())
 
         if not overdue_list:
             print("✓ ไม่มีรายการเกินกำหนดคืน")
             return
 
-        overdue_list.sort(key=lambda x: x[1], reverse=True)
+        overdue_list.sort(key=itemgetter(2), reverse=True)
 
         print(f"\n🔴 พบรายการเกินกำหนด {len(overdue_list)} รายการ")
         print("=" * 110)
 
-        for idx, (borrow, days_overdue) in enumerate(overdue_list, 1):
-            book_id = self._decode_string(borrow[1])
+        out = []
+        book_lookup = self._record_lookup(self.books_file)
+        member_lookup = self._record_lookup(self.members_file)
+        for idx, (borrow, borrow_date, days_overdue) in enumerate(overdue_list, 1):
             member_id = self._decode_string(borrow[2])
-            book = self._find_book_by_id(book_id)
-            member = self._find_member_by_id(member_id)
+            book = book_lookup(borrow[1])
+            member = member_lookup(borrow[2])
 
             book_quantity = ""
             if book:
-                try:
-                    quantity_str = self._decode_string(book[5])
-                    quantity = int(quantity_str)
-                    book_quantity = f" (จำนวน: {quantity} เล่ม)"
-                except:
-                    book_quantity = " (จำนวน: 1 เล่ม)"
+                book_quantity = f" (จำนวน: {parse_quantity(book[5])} เล่ม)"
             
-            print(f"\n{idx}. หนังสือ: {self._decode_string(book[1]) if book else 'N/A'}{book_quantity}")
-            print(f"   ผู้ยืม: {self._decode_string(member[1]) if member else 'N/A'} (ID: {member_id})")
-            print(f"   วันที่ยืม: {self._decode_string(borrow[3])}")
-            borrow_date = datetime.datetime.strptime(self._decode_string(borrow[3]), "%Y-%m-%d").date()
+            out.append(f"\n{idx}. หนังสือ: {self._decode_string(book[1]) if book else 'N/A'}{book_quantity}")
+            out.append(f"   ผู้ยืม: {self._decode_string(member[1]) if member else 'N/A'} (ID: {member_id})")
+            out.append(f"   วันที่ยืม: {self._decode_string(borrow[3])}")
             due_date = borrow_date + datetime.timedelta(days=7)
-            print(f"   กำหนดคืน: {due_date.strftime('%Y-%m-%d')}")
-            print(f"   🔴 เกินกำหนด: {days_overdue} วัน")
-            print("-" * 110)
+            out.append(f"   กำหนดคืน: {due_date.strftime('%Y-%m-%d')}")
+            out.append(f"   🔴 เกินกำหนด: {days_overdue} วัน")
+            out.append("-" * 110)
+        sys.stdout.write('\n'.join(out) + '\n')
 
     def _find_borrow_by_id(self, borrow_id: str):
-        borrows = self._get_all_borrows()
-        for borrow in borrows:
-            if self._decode_string(borrow[0]) == borrow_id and borrow[6] == b'0':
-                return borrow
-        return None
-
-    def _find_active_borrow_by_book_id(self, book_id: str):
-        if not os.path.exists(self.borrows_file):
-            return None
+        records, id_index = self._load_records(self.borrows_file, self._borrow_struct)
+        index = id_index.get(self._encode_id(borrow_id))
+        return records[index] if index is not None else None
 
-        with open(self.borrows_file, 'rb') as f:
-            index = 0
-            while True:
-                data = f.read(self.borrow_size)
-                if not data:
-                    break
-                borrow = struct.unpack(self.borrow_format, data)
-                if (self._decode_string(borrow[1]) == book_id and 
-                    borrow[5] == b'B' and borrow[6] == b'0'):
-                    return (index, borrow)
-                index += 1
-        return None
+    def _iter_active_borrow_records(self):
+        """Yield (index, borrow) for borrows that are still out and not deleted, in file order"""
+        self._refresh_active_borrow_indexes()
+        return iter(self._active_borrows)
 
     def _get_all_borrows(self) -> List:
-        borrows = []
-        if not os.path.exists(self.borrows_file):
-            return borrows
-
-        with open(self.borrows_file, 'rb') as f:
-            while True:
-                data = f.read(self.borrow_size)
-                if not data:
-                    break
-                borrow = struct.unpack(self.borrow_format, data)
-                borrows.append(borrow)
-        return borrows
+        return self._load_records(self.borrows_file, self._borrow_struct)[0]
+
+    def _display_borrow_rows(self, borrows):
+        """Print compact borrow rows, resolving lookups and today's date once for the batch"""
+        book_lookup = self._record_lookup(self.books_file)
+        member_lookup = self._record_lookup(self.members_file)
+        today = datetime.date.today()
+        out = [self._format_borrow(borrow, True, book_lookup, member_lookup, today) for borrow in borrows]
+        if out:
+            sys.stdout.write('\n'.join(out) + '\n')
 
     def _display_borrow(self, borrow, compact=False):
+        sys.stdout.write(self._format_borrow(borrow, compact) + "\n")
+
+    def _format_borrow(self, borrow, compact=False, book_lookup=None, member_lookup=None, today=None) -> str:
         borrow_id = self._decode_string(borrow[0])
         book_id = self._decode_string(borrow[1])
         member_id = self._decode_string(borrow[2])
@@ -1537,12 +1904,14 @@ class LibrarySystem:
         status = "ยืมอยู่" if borrow[5] == b'B' else "คืนแล้ว"
 
         try:
-            borrow_date = datetime.datetime.strptime(borrow_date_str, "%Y-%m-%d").date()
+            borrow_date = self._parse_ymd(borrow_date_str)
+            if borrow_date is None:
+                raise ValueError(borrow_date_str)
             due_date = borrow_date + datetime.timedelta(days=7)
             due_date_str = due_date.strftime("%Y-%m-%d")
 
             if borrow[5] == b'B':
-                current_date = datetime.date.today()
+                current_date = today or datetime.date.today()
                 days_until_due = (due_date - current_date).days
                 if days_until_due < 0:
                     overdue_info = f" (เกิน {abs(days_until_due)} วัน)"
@@ -1552,39 +1921,40 @@ class LibrarySystem:
                     overdue_info = f" (เหลือ {days_until_due} วัน)"
             else:
                 overdue_info = ""
-        except:
+        except (ValueError, OverflowError):  # malformed or out-of-range date
             due_date_str = "-"
             overdue_info = ""
 
-        book = self._find_book_by_id(book_id)
-        member = self._find_member_by_id(member_id)
+        # ตารางยาวส่ง lookup ที่เตรียมไว้มา จะได้ไม่ต้องเช็กแคชทุกแถว
+        if book_lookup is None:
+            book_lookup = self._record_lookup(self.books_file)
+        if member_lookup is None:
+            member_lookup = self._record_lookup(self.members_file)
+        book = book_lookup(borrow[1])
+        member = member_lookup(borrow[2])
 
         book_title = self._decode_string(book[1]) if book else f"Book ID: {book_id}"
         if book:
-            try:
-                quantity_str = self._decode_string(book[5])
-                quantity = int(quantity_str)
-                book_title += f" ({quantity} เล่ม)"
-            except:
-                book_title += " (1 เล่ม)"
+            book_title += f" ({parse_quantity(book[5])} เล่ม)"
         
         member_name = self._decode_string(member[1]) if member else f"Member ID: {member_id}"
 
         if compact:
-            print(f"ID: {borrow_id} | {book_title[:25]:<25} | {member_name[:15]:<15} | ID:{member_id} | {borrow_date_str} | {status}{overdue_info}")
-        else:
-            print("\n" + "=" * 60)
-            print("📋 ข้อมูลรายการยืม")
-            print("=" * 60)
-            print(f"🔢 รหัสการยืม    : {borrow_id}")
-            print(f"📚 หนังสือ       : {book_title}")
-            print(f"👤 ผู้ยืม        : {member_name}")
-            print(f"🆔 ID สมาชิก     : {member_id}")
-            print(f"📅 วันที่ยืม     : {borrow_date_str}")
-            print(f"⏰ กำหนดคืน      : {due_date_str}")
-            print(f"📤 วันที่คืน     : {return_date}")
-            print(f"📊 สถานะ        : {status}{overdue_info}")
-            print("=" * 60)
+            return f"ID: {borrow_id} | {book_title:<25.25} | {member_name:<15.15} | ID:{member_id} | {borrow_date_str} | {status}{overdue_info}"
+        return "\n".join([
+            "\n" + "=" * 60,
+            "📋 ข้อมูลรายการยืม",
+            "=" * 60,
+            f"🔢 รหัสการยืม    : {borrow_id}",
+            f"📚 หนังสือ       : {book_title}",
+            f"👤 ผู้ยืม        : {member_name}",
+            f"🆔 ID สมาชิก     : {member_id}",
+            f"📅 วันที่ยืม     : {borrow_date_str}",
+            f"⏰ กำหนดคืน      : {due_date_str}",
+            f"📤 วันที่คืน     : {return_date}",
+            f"📊 สถานะ        : {status}{overdue_info}",
+            "=" * 60,
+        ])
 
     def _update_book_status(self, book_id: str, status: bytes):
         book_index = self._find_book_index_by_id(book_id)
@@ -1595,18 +1965,12 @@ class LibrarySystem:
         if not book:
             return
 
-        updated_book = struct.pack(
-            self.book_format,
-            book[0], book[1], book[2], book[3], book[4], book[5],
-            status,
-            book[7]
-        )
-
-        self._update_record(self.books_file, book_index, updated_book, self.book_size)
+        self._update_field(self.books_file, 6, status, [(book_index, book)])
 
     def _get_available_books_for_borrow(self):
         """Get list of books available for borrowing with their available quantities"""
         books = self._get_all_books()
+        borrowed_counts = self._get_borrowed_quantities()
         available_books = []
         
         for book in books:
@@ -1616,12 +1980,9 @@ class LibrarySystem:
                 author = self._decode_string(book[2])
                 
                 # Calculate available quantity
-                try:
-                    total_quantity = int(self._decode_string(book[5]))
-                except:
-                    total_quantity = 1  # fallback for old records
+                total_quantity = parse_quantity(book[5])
                 
-                borrowed_quantity = self._get_borrowed_quantity(book_id)
+                borrowed_quantity = borrowed_counts[book[0]]
                 available_quantity = total_quantity - borrowed_quantity
                 
                 if available_quantity > 0:
@@ -1629,20 +1990,40 @@ class LibrarySystem:
         
         return available_books
 
+    def _refresh_active_borrow_indexes(self):
+        """Rebuild the active-borrow indexes if the cached borrow records were reloaded or patched"""
+        borrows = self._load_records(self.borrows_file, self._borrow_struct)[0]
+        if borrows is self._active_borrows_source:
+            return
+
+        active = []
+        counts = Counter()
+        by_member = defaultdict(list)
+        history_by_member = defaultdict(list)
+        for index, borrow in enumerate(borrows):
+            if borrow[6] != b'0':
+                continue
+            history_by_member[borrow[2]].append(borrow)
+            if borrow[5] == b'B':
+                active.append((index, borrow))
+                counts[borrow[1]] += 1
+                by_member[borrow[2]].append((index, borrow))
+        self._active_borrows = active
+        self._borrowed_counts = counts
+        self._active_borrows_by_member = by_member
+        self._borrows_by_member = history_by_member
+        self._active_borrows_source = borrows
+
+    def _get_borrowed_quantities(self) -> Counter:
+        """Count currently borrowed copies per raw book ID field (shared; do not modify)"""
+        self._refresh_active_borrow_indexes()
+        return self._borrowed_counts
+
     def _get_borrowed_quantity(self, book_id):
         """Get the total quantity of a book that is currently borrowed"""
-        borrows = self._get_all_borrows()
-        borrowed_quantity = 0
-        
-        for borrow in borrows:
-            if (borrow[6] == b'0' and  # Not deleted
-                borrow[5] == b'B' and  # Still borrowed
-                self._decode_string(borrow[1]) == book_id):
-                # For now, we assume each borrow record represents 1 book
-                # In the future, we could add quantity to borrow records
-                borrowed_quantity += 1
-        
-        return borrowed_quantity
+        # For now, we assume each borrow record represents 1 book
+        # In the future, we could add quantity to borrow records
+        return self._get_borrowed_quantities()[self._encode_id(book_id)]
 
     def _update_book_borrowed_quantity(self, book_id, borrow_quantity):
         """Update book status when borrowing (this is a placeholder for now)"""
@@ -1651,38 +2032,20 @@ class LibrarySystem:
         # field to book records.
         pass
 
-    def _get_member_active_borrows(self, member_id):
-        """Get list of active borrows for a member"""
-        borrows = self._get_all_borrows()
-        active_borrows = []
-        
-        for borrow in borrows:
-            if (borrow[6] == b'0' and  # Not deleted
-                borrow[5] == b'B' and  # Still borrowed
-                self._decode_string(borrow[2]) == member_id):  # Same member
-                
-                borrow_id = self._decode_string(borrow[0])
-                book_id = self._decode_string(borrow[1])
-                borrow_date_str = self._decode_string(borrow[3])
-                
-                active_borrows.append((borrow_id, book_id, borrow_date_str))
-        
-        return active_borrows
+    def _get_member_active_borrow_records(self, member_id) -> List:
+        """Get (file index, borrow record) for each active borrow of a member"""
+        self._refresh_active_borrow_indexes()
+        return list(self._active_borrows_by_member.get(self._encode_id(member_id), ()))
 
     def delete_borrow(self):
         print("\n=== ลบรายการยืม ===")
         borrow_id = input("กรอก ID รายการยืมที่ต้องการลบ: ").strip()
 
-        borrow_index = self._find_borrow_index_by_id(borrow_id)
-        if borrow_index == -1:
+        borrow_index, borrow = self._find_borrow_with_index(borrow_id)
+        if borrow is None:
             print("ไม่พบรายการยืม")
             return
 
-        borrow = self._get_borrow_by_index(borrow_index)
-        if not borrow:
-            print("เกิดข้อผิดพลาดในการอ่านข้อมูล")
-            return
-
         print("รายการยืมที่จะลบ:")
         self._display_borrow(borrow)
 
@@ -1695,136 +2058,95 @@ class LibrarySystem:
             book_id = self._decode_string(borrow[1])
             self._update_book_status(book_id, b'A')
 
-        deleted_borrow = struct.pack(
-            self.borrow_format,
-            borrow[0], borrow[1], borrow[2], borrow[3], borrow[4], borrow[5],
-            b'1'
-        )
-
-        self._update_record(self.borrows_file, borrow_index, deleted_borrow, self.borrow_size)
+        self._update_field(self.borrows_file, 6, b'1', [(borrow_index, borrow)])
         print("ลบรายการยืมเรียบร้อย")
-        self.operation_history.append(f"{datetime.datetime.now()}: ลบรายการยืม ID: {borrow_id}")
+        self._log_operation('delete_borrow', borrow_id)
 
-    def _find_borrow_index_by_id(self, borrow_id: str) -> int:
-        if not os.path.exists(self.borrows_file):
-            return -1
-
-        with open(self.borrows_file, 'rb') as f:
-            index = 0
-            while True:
-                data = f.read(self.borrow_size)
-                if not data:
-                    break
-                borrow = struct.unpack(self.borrow_format, data)
-                if self._decode_string(borrow[0]) == borrow_id and borrow[6] == b'0':
-                    return index
-                index += 1
-        return -1
-
-    def _get_borrow_by_index(self, index: int):
-        if not os.path.exists(self.borrows_file):
-            return None
-
-        with open(self.borrows_file, 'rb') as f:
-            f.seek(index * self.borrow_size)
-            data = f.read(self.borrow_size)
-            if not data:
-                return None
-            return struct.unpack(self.borrow_format, data)
+    def _find_borrow_with_index(self, borrow_id: str) -> Tuple[int, object]:
+        """Return (file index, record) for a borrow ID from one cache lookup, or (-1, None)"""
+        records, id_index = self._load_records(self.borrows_file, self._borrow_struct)
+        index = id_index.get(self._encode_id(borrow_id))
+        if index is None:
+            return -1, None
+        return index, records[index]
 
     # === STATISTICS AND REPORTS ===
     def view_statistics(self):
-        print("\n" + "=" * 60)
-        print("📊 สถิติโดยสรุป (Summary Statistics)")
-        print("=" * 60)
-
-        books = self._get_all_books()
-        active_books = [book for book in books if book[7] == b'0']  # Updated index for deleted flag
-        available_books = [book for book in active_books if book[6] == b'A']  # Updated index for status
-        borrowed_books = [book for book in active_books if book[6] == b'B']   # Updated index for status
-        deleted_books = [book for book in books if book[7] == b'1']  # Updated index for deleted flag
-
-        members = self._get_all_members()
-        active_members = [member for member in members if member[6] == b'0' and member[5] == b'A']
-        banned_members = [member for member in members if member[6] == b'0' and member[5] == b'S']
-        deleted_members = [member for member in members if member[6] == b'1']
-
-        borrows = self._get_all_borrows()
-        active_borrows = [borrow for borrow in borrows if borrow[6] == b'0']
-        current_borrows = [borrow for borrow in active_borrows if borrow[5] == b'B']
-        returned_borrows = [borrow for borrow in active_borrows if borrow[5] == b'R']
-        deleted_borrows = [borrow for borrow in borrows if borrow[6] == b'1']
-
-        current_date = datetime.date.today()
-        overdue_count = 0
-        for borrow in current_borrows:
-            try:
-                borrow_date = datetime.datetime.strptime(
-                    self._decode_string(borrow[3]), "%Y-%m-%d"
-                ).date()
-                due_date = borrow_date + datetime.timedelta(days=7)
-                if (current_date - due_date).days > 0:
-                    overdue_count += 1
-            except:
-                pass
-
-        # Calculate total quantities
-        total_quantity = 0
-        available_quantity = 0
-        borrowed_quantity = 0
-        
-        for book in active_books:
-            try:
-                quantity = int(self._decode_string(book[5]))
-                total_quantity += quantity
-                if book[6] == b'A':
-                    available_quantity += quantity
-                elif book[6] == b'B':
-                    borrowed_quantity += quantity
-            except:
-                total_quantity += 1
-                if book[6] == b'A':
-                    available_quantity += 1
-                elif book[6] == b'B':
-                    borrowed_quantity += 1
+        out = [
+            "\n" + "=" * 60,
+            "📊 สถิติโดยสรุป (Summary Statistics)",
+            "=" * 60,
+        ]
+
+        # หนังสือ: นับรายการและรวมจำนวนเล่มแยกตามสถานะในรอบเดียว
+        book_counts = Counter()
+        book_quantities = Counter()
+        deleted_books = 0
+        for book in self._get_all_books():
+            if book[7] != b'0':
+                if book[7] == b'1':
+                    deleted_books += 1
+                continue
+            quantity = parse_quantity(book[5])
+            book_counts[book[6]] += 1
+            book_quantities[book[6]] += quantity
+        active_books = sum(book_counts.values())
+        total_quantity = sum(book_quantities.values())
+        available_quantity = book_quantities[b'A']
+        borrowed_quantity = book_quantities[b'B']
+
+        # นับทั้งคอลัมน์ (status, deleted) ในรอบเดียว; map + itemgetter + Counter ทำงานในชั้น C
+        member_flags = Counter(map(_status_and_deleted, self._get_all_members()))
+        active_members = member_flags[(b'A', b'0')]
+        banned_members = member_flags[(b'S', b'0')]
+        deleted_members = sum(n for (_, deleted), n in member_flags.items() if deleted == b'1')
+
+        borrow_flags = Counter(map(_status_and_deleted, self._get_all_borrows()))
+        active_borrows = sum(n for (_, deleted), n in borrow_flags.items() if deleted == b'0')
+        current_borrows = borrow_flags[(b'B', b'0')]
+        returned_borrows = borrow_flags[(b'R', b'0')]
+        deleted_borrows = sum(n for (_, deleted), n in borrow_flags.items() if deleted == b'1')
+
+        overdue_count = sum(1 for _ in self._iter_overdue_borrows())
 
         # 📚 สถิติหนังสือ
-        print("\n📚 สถิติหนังสือ (Book Statistics)")
-        print("-" * 50)
-        print(f"  📖 รายการหนังสือทั้งหมด: {len(active_books):>3} รายการ")
-        print(f"  📚 จำนวนหนังสือรวม:     {total_quantity:>3} เล่ม")
-        print(f"  ✅ หนังสือว่าง:          {len(available_books):>3} รายการ ({available_quantity:>3} เล่ม)")
-        print(f"  🔄 หนังสือถูกยืม:        {len(borrowed_books):>3} รายการ ({borrowed_quantity:>3} เล่ม)")
-        print(f"  🗑️  หนังสือที่ถูกลบ:      {len(deleted_books):>3} รายการ")
+        out.append("\n📚 สถิติหนังสือ (Book Statistics)")
+        out.append("-" * 50)
+        out.append(f"  📖 รายการหนังสือทั้งหมด: {active_books:>3} รายการ")
+        out.append(f"  📚 จำนวนหนังสือรวม:     {total_quantity:>3} เล่ม")
+        out.append(f"  ✅ หนังสือว่าง:          {book_counts[b'A']:>3} รายการ ({available_quantity:>3} เล่ม)")
+        out.append(f"  🔄 หนังสือถูกยืม:        {book_counts[b'B']:>3} รายการ ({borrowed_quantity:>3} เล่ม)")
+        out.append(f"  🗑️  หนังสือที่ถูกลบ:      {deleted_books:>3} รายการ")
 
         # 👥 สถิติสมาชิก
-        print("\n👥 สถิติสมาชิก (Member Statistics)")
-        print("-" * 50)
-        print(f"  👤 สมาชิกทั้งหมด:        {len(active_members):>3} คน")
-        print(f"  ✅ สมาชิกปกติ:           {len(active_members):>3} คน")
-        print(f"  🚫 สมาชิกถูกแบน:         {len(banned_members):>3} คน")
-        print(f"  🗑️  สมาชิกที่ถูกลบ:       {len(deleted_members):>3} คน")
+        out.append("\n👥 สถิติสมาชิก (Member Statistics)")
+        out.append("-" * 50)
+        out.append(f"  👤 สมาชิกทั้งหมด:        {active_members:>3} คน")
+        out.append(f"  ✅ สมาชิกปกติ:           {active_members:>3} คน")
+        out.append(f"  🚫 สมาชิกถูกแบน:         {banned_members:>3} คน")
+        out.append(f"  🗑️  สมาชิกที่ถูกลบ:       {deleted_members:>3} คน")
 
         # 📋 สถิติการยืม
-        print("\n📋 สถิติการยืม (Borrow Statistics)")
-        print("-" * 50)
-        print(f"  📝 รายการยืมทั้งหมด:     {len(active_borrows):>3} รายการ")
-        print(f"  🔄 กำลังยืมอยู่:         {len(current_borrows):>3} รายการ")
-        print(f"  ⏰ เกินกำหนดคืน:         {overdue_count:>3} รายการ")
-        print(f"  ✅ คืนแล้ว:             {len(returned_borrows):>3} รายการ")
-        print(f"  🗑️  รายการที่ถูกลบ:       {len(deleted_borrows):>3} รายการ")
+        out.append("\n📋 สถิติการยืม (Borrow Statistics)")
+        out.append("-" * 50)
+        out.append(f"  📝 รายการยืมทั้งหมด:     {active_borrows:>3} รายการ")
+        out.append(f"  🔄 กำลังยืมอยู่:         {current_borrows:>3} รายการ")
+        out.append(f"  ⏰ เกินกำหนดคืน:         {overdue_count:>3} รายการ")
+        out.append(f"  ✅ คืนแล้ว:             {returned_borrows:>3} รายการ")
+        out.append(f"  🗑️  รายการที่ถูกลบ:       {deleted_borrows:>3} รายการ")
 
         # 📈 สรุปภาพรวม
-        print("\n📈 สรุปภาพรวม (Overall Summary)")
-        print("-" * 50)
-        print(f"  📊 อัตราการยืม:         {(len(current_borrows)/len(active_borrows)*100):>5.1f}%" if active_borrows else "  📊 อัตราการยืม:           0.0%")
-        print(f"  📊 อัตราการคืน:         {(len(returned_borrows)/len(active_borrows)*100):>5.1f}%" if active_borrows else "  📊 อัตราการคืน:           0.0%")
-        print(f"  📊 อัตราการเกินกำหนด:    {(overdue_count/len(current_borrows)*100):>5.1f}%" if current_borrows else "  📊 อัตราการเกินกำหนด:      0.0%")
-        print(f"  📊 อัตราการใช้งานหนังสือ: {(borrowed_quantity/total_quantity*100):>5.1f}%" if total_quantity else "  📊 อัตราการใช้งานหนังสือ:   0.0%")
-
-        print("\n" + "=" * 60)
-        print("📅 ข้อมูลอัปเดตล่าสุด:", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        print("=" * 60)
+        out.append("\n📈 สรุปภาพรวม (Overall Summary)")
+        out.append("-" * 50)
+        out.append(f"  📊 อัตราการยืม:         {(current_borrows/active_borrows*100):>5.1f}%" if active_borrows else "  📊 อัตราการยืม:           0.0%")
+        out.append(f"  📊 อัตราการคืน:         {(returned_borrows/active_borrows*100):>5.1f}%" if active_borrows else "  📊 อัตราการคืน:           0.0%")
+        out.append(f"  📊 อัตราการเกินกำหนด:    {(overdue_count/current_borrows*100):>5.1f}%" if current_borrows else "  📊 อัตราการเกินกำหนด:      0.0%")
+        out.append(f"  📊 อัตราการใช้งานหนังสือ: {(borrowed_quantity/total_quantity*100):>5.1f}%" if total_quantity else "  📊 อัตราการใช้งานหนังสือ:   0.0%")
+
+        out.append("\n" + "=" * 60)
+        out.append("📅 ข้อมูลอัปเดตล่าสุด: " + format_timestamp(int(time.time())))
+        out.append("=" * 60)
+        sys.stdout.write('\n'.join(out) + '\n')
 
     def generate_report(self):
         print("\n=== สร้างรายงาน ===")
@@ -1846,17 +2168,19 @@ class LibrarySystem:
             report_content.append("")
 
             # Get data
-            books = self._get_all_books()
-            active_books = [book for book in books if book[7] == b'0']
+            active_books = self._get_live_records(self.books_file)
             
-            members = self._get_all_members()
-            active_members = [member for member in members if member[6] == b'0' and member[5] == b'A']
-            banned_members = [member for member in members if member[6] == b'0' and member[5] == b'S']
-
-            borrows = self._get_all_borrows()
-            active_borrows = [borrow for borrow in borrows if borrow[6] == b'0']
-            current_borrows = [borrow for borrow in active_borrows if borrow[5] == b'B']
-            returned_borrows = [borrow for borrow in active_borrows if borrow[5] == b'R']
+            # แยกสมาชิกที่ยังไม่ถูกลบตามสถานะในรอบเดียว
+            active_members = []
+            banned_members = []
+            for member in self._get_live_records(self.members_file):
+                if member[5] == b'A':
+                    active_members.append(member)
+                elif member[5] == b'S':
+                    banned_members.append(member)
+
+            active_borrows = self._get_live_records(self.borrows_file)
+            status_counts = Counter(map(itemgetter(5), active_borrows))
 
             # Borrow Records Table
             report_content.append("Borrow Records")
@@ -1865,31 +2189,39 @@ class LibrarySystem:
             report_content.append("-" * 123)
 
             # Display individual borrow records (not grouped)
+            # ผูกเมธอด/ตารางที่ใช้ทุกแถวไว้เป็นตัวแปร local ก่อนเข้าลูป
+            book_lookup = self._record_lookup(self.books_file)
+            member_lookup = self._record_lookup(self.members_file)
+            decode = self._decode_string
+            borrow_status = REPORT_BORROW_STATUS.get
+            banned = REPORT_BANNED.get
+            add_line = report_content.append
+            # สมาชิก/หนังสือคนเดิมมักมีหลายแถว: ถอดรหัสคอลัมน์ของแต่ละคน/เล่มครั้งเดียว (None = ไม่พบ)
+            member_cells = {}
+            book_titles = {}
             for borrow in active_borrows:
-                member_id = self._decode_string(borrow[2])
-                book_id = self._decode_string(borrow[1])
-                member = self._find_member_by_id(member_id)
-                book = self._find_book_by_id(book_id)
-                
-                if member and book:
-                    member_name = self._decode_string(member[1])
-                    member_phone = self._decode_string(member[3])
-                    member_email = self._decode_string(member[2])
-                    book_title = self._decode_string(book[1])
-                    
-                    try:
-                        book_quantity = int(self._decode_string(book[5]))
-                    except:
-                        book_quantity = 1
-                    
-                    borrow_date_str = self._decode_string(borrow[3])
-                    return_date_str = self._decode_string(borrow[4]) if borrow[4] else "-"
-                    status = "Borrowed" if borrow[5] == b'B' else "Returned"
-                    banned_status = "yes" if member[5] == b'S' else "no"
-                    
+                if borrow[2] not in member_cells:
+                    member = member_lookup(borrow[2])
+                    member_cells[borrow[2]] = (
+                        # member ID, name, phone, email, banned
+                        (decode(borrow[2]), decode(member[1]), decode(member[3]), decode(member[2]),
+                         banned(member[5], "no"))
+                        if member else None)
+                if borrow[1] not in book_titles:
+                    book = book_lookup(borrow[1])
+                    book_titles[borrow[1]] = decode(book[1]) if book else None
+                cells = member_cells[borrow[2]]
+                title = book_titles[borrow[1]]
+
+                if cells and title is not None:
                     # Format the line to match the table structure
-                    line = f"{member_id:<4} | {member_name[:8]:<8} | {member_phone:<12} | {member_email[:18]:<18} | {book_title[:18]:<18} | {borrow_date_str:<11} | {return_date_str:<11} | {status:<9} | {banned_status}"
-                    report_content.append(line)
+                    member_id, name, phone, email, banned_status = cells
+                    add_line(REPORT_ROW % (
+                        member_id, name, phone, email, title,
+                        decode(borrow[3]),  # borrow date
+                        decode(borrow[4]) if borrow[4] else "-",  # return date
+                        borrow_status(borrow[5], "Returned"),
+                        banned_status))
 
             report_content.append("")
 
@@ -1897,8 +2229,8 @@ class LibrarySystem:
             report_content.append("Summary")
             report_content.append("")
             report_content.append(f"Total Borrows (records): {len(active_borrows)}")
-            report_content.append(f"Currently Borrowed: {len(current_borrows)}")
-            report_content.append(f"Returned: {len(returned_borrows)}")
+            report_content.append(f"Currently Borrowed: {status_counts[b'B']}")
+            report_content.append(f"Returned: {status_counts[b'R']}")
             report_content.append(f"Banned Members: {len(banned_members)}")
             report_content.append("")
             report_content.append("Members by Status:")
@@ -1912,16 +2244,15 @@ class LibrarySystem:
             
             # Get recent activities from operation history
             if self.operation_history:
-                recent_activities = self.operation_history[-5:]
-                for activity in reversed(recent_activities):  # Show most recent first
-                    report_content.append(f"{activity}")
+                # Show most recent first
+                report_content.extend(self._render_history(5))
             else:
                 # Generate some sample activities based on current data
                 sample_activities = []
-                for borrow in current_borrows[:3]:  # Show up to 3 current borrows
+                current_borrows = (borrow for borrow in active_borrows if borrow[5] == b'B')
+                for borrow in itertools.islice(current_borrows, 3):  # Show up to 3 current borrows
                     member_id = self._decode_string(borrow[2])
-                    book_id = self._decode_string(borrow[1])
-                    book = self._find_book_by_id(book_id)
+                    book = book_lookup(borrow[1])
                     if book:
                         book_title = self._decode_string(book[1])
                         borrow_date_str = self._decode_string(borrow[3])
@@ -1940,101 +2271,61 @@ class LibrarySystem:
             report_content.append("")
             report_content.append("End of Report")
 
-            # Write to file
-            with open(self.report_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(report_content))
+            # Write to file: stream the lines through a large buffer instead of joining one big string
+            with open(self.report_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                print(*report_content, sep='\n', end='', file=f)
 
             print(f"สร้างรายงานเรียบร้อย: {self.report_file}")
 
-            show_report = input("แสดงรายงานหรือไม่? (y/N): ").strip().lower()
-            if show_report == 'y':
-                print("\n" + "\n".join(report_content))
+            show_report = self._input_or_default("แสดงรายงานหรือไม่? (y/N): ").strip()
+            if show_report[:1] in ('y', 'Y'):  # y / Y / yes
+                print('', *report_content, sep='\n')
 
         except Exception as e:
             print(f"เกิดข้อผิดพลาดในการสร้างรายงาน: {e}")
 
-    # === MAIN MENU ===
-    def show_main_menu(self):
-        print("\n" + "=" * 70)
-        print(" " * 25 + "🏛️ ระบบจัดการห้องสมุด 🏛️")
-        print(" " * 20 + "Library Management System v1.0")
-        print("=" * 70)
-        print("\n📋 เมนูหลัก:")
-        print(" ")
-        print("─" * 70)
-        print("1. 📚 จัดการหนังสือ (Books Management)")
-        print("2. 👥 จัดการสมาชิก (Members Management)")
-        print("3. 📖 จัดการการยืม-คืน (Borrow/Return Management)")
-        print("4. 📊 ดูสถิติโดยสรุป (Statistics)")
-        print("5. 📄 สร้างรายงาน (Generate Report)")
-        print("0. 🚪 ออกจากระบบ (Exit)")
-        print("─" * 70)
-
-    def show_book_menu(self):
-        print("\n" + "=" * 60)
-        print(" " * 20 + "📚 เมนูจัดการหนังสือ 📚")
-        print("=" * 60)
-        print("\n📋 เลือกการดำเนินการ:")
-        print("─" * 60)
-        print("1. ➕ เพิ่มหนังสือ (Add Book)")
-        print("2. 👁️  ดูข้อมูลหนังสือ (View Books)")
-        print("3. ✏️  แก้ไขหนังสือ (Update Book)")
-        print("4. 🗑️ ลบหนังสือ (Delete Book)")
-        print("0. 🔙 กลับเมนูหลัก")
-        print("─" * 60)
-
-    def show_member_menu(self):
-        print("\n" + "=" * 60)
-        print(" " * 20 + "👥 เมนูจัดการสมาชิก 👥")
-        print("=" * 60)
-        print("\n📋 เลือกการดำเนินการ:")
-        print("─" * 60)
-        print("1. ➕ เพิ่มสมาชิก (Add Member)")
-        print("2. 👁️  ดูข้อมูลสมาชิก (View Members)")
-        print("3. ✏️  แก้ไขสมาชิก (Update Member)")
-        print("4. 🗑️ ลบสมาชิก (Delete Member)")
-        print("0. 🔙 กลับเมนูหลัก")
-        print("─" * 60)
+    def _input_or_default(self, prompt: str, default: str = 'n') -> str:
+        """input() that returns default on EOF"""
+        try:
+            return input(prompt)
+        except EOFError:
+            sys.stdout.write("\n")
+            return default
 
-    def show_borrow_menu(self):
-        print("\n" + "=" * 60)
-        print(" " * 20 + "📖 เมนูจัดการการยืม-คืน 📖")
-        print("=" * 60)
-        print("\n📋 เลือกการดำเนินการ:")
-        print("─" * 60)
-        print("1. 📚 ยืมหนังสือ (Borrow Book)")
-        print("2. 🔄 คืนหนังสือ (Return Book)")
-        print("3. 👁️  ดูรายการยืม (View Borrows)")
-        print("4. 🗑️ ลบรายการยืม (Delete Borrow)")
-        print("0. 🔙 กลับเมนูหลัก")
-        print("─" * 60)
+    # === MAIN MENU ===
+    # แต่ละเมนูคือการเขียนบล็อกคงที่ ผูกอาร์กิวเมนต์ไว้ล่วงหน้าด้วย partial ไม่ต้องผ่านเฟรมของเมธอด
+    show_main_menu = staticmethod(functools.partial(write_block, MAIN_MENU))
+    show_book_menu = staticmethod(functools.partial(write_block, BOOK_MENU))
+    show_member_menu = staticmethod(functools.partial(write_block, MEMBER_MENU))
+    show_borrow_menu = staticmethod(functools.partial(write_block, BORROW_MENU))
 
     def run(self):
+        # ผูกชื่อที่ใช้ทุกรอบไว้เป็นตัวแปร local
+        read = input
+        show_menu = self.show_main_menu
+        actions = self._main_dispatch
+        # เลือกผิดไม่ได้เปลี่ยนอะไร เมนูเดิมยังอยู่บนจอ จึงไม่ต้องพิมพ์ซ้ำ
+        redraw = True
 
         while True:
             try:
-                self.show_main_menu()
-                choice = input("\n❓ เลือกเมนู (0-5): ").strip()
-
-                if choice == '1':
-                    self._handle_book_menu()
-                elif choice == '2':
-                    self._handle_member_menu()
-                elif choice == '3':
-                    self._handle_borrow_menu()
-                elif choice == '4':
-                    self.view_statistics()
-                elif choice == '5':
-                    self.generate_report()
-                elif choice == '0':
-                    print("\n" + "=" * 60)
-                    print(" " * 20 + "🙏 ขอบคุณที่ใช้บริการ! 🙏")
-                    print(" " * 15 + "Thank you for using our service!")
-                    print("=" * 60)
-                    break
+                if redraw:
+                    show_menu()
+                redraw = True
+                choice = read("\n❓ เลือกเมนู (0-5): ").strip()
+
+                # ทางปกติคือเลือกถูก; KeyError จับเฉพาะการค้นตาราง ไม่ครอบตัว action
+                try:
+                    action = actions[choice]
+                except KeyError:
+                    if choice == '0':
+                        write_block(EXIT_BANNER)
+                        break
+                    print(INVALID_MAIN_CHOICE)
+                    read(PROMPT_CONTINUE)
+                    redraw = False
                 else:
-                    print("\n❌ กรุณาเลือกเมนูที่ถูกต้อง (0-5)")
-                    input("กด Enter เพื่อดำเนินการต่อ...")
+                    action()
 
             except KeyboardInterrupt:
                 print("\n\n⚠️ ระบบถูกปิดโดยผู้ใช้")
@@ -2042,62 +2333,36 @@ class LibrarySystem:
                 break
             except Exception as e:
                 print(f"\n❌ เกิดข้อผิดพลาด: {e}")
-                input("กด Enter เพื่อดำเนินการต่อ...")
+                read(PROMPT_CONTINUE)
 
-    def _handle_book_menu(self):
+        self.close()
+
+    def _run_submenu(self, show_menu, dispatch):
+        read = input
+        redraw = True
         while True:
-            self.show_book_menu()
-            choice = input("\n❓ เลือก (0-4): ").strip()
-
-            if choice == '1':
-                self.add_book()
-            elif choice == '2':
-                self.view_books()
-            elif choice == '3':
-                self.update_book()
-            elif choice == '4':
-                self.delete_book()
-            elif choice == '0':
-                break
+            if redraw:
+                show_menu()
+            choice = read("\n❓ เลือก (0-4): ").strip()
+
+            try:
+                action = dispatch[choice]
+            except KeyError:
+                if choice == '0':
+                    break
+                print(INVALID_SUB_CHOICE)
+                read(PROMPT_CONTINUE)
+                redraw = False
             else:
-                print("\n❌ กรุณาเลือกเมนูที่ถูกต้อง (0-4)")
-                input("กด Enter เพื่อดำเนินการต่อ...")
+                action()
+                redraw = True
+
+    def _handle_book_menu(self):
+        self._run_submenu(self.show_book_menu, self._book_dispatch)
 
     def _handle_member_menu(self):
-        while True:
-            self.show_member_menu()
-            choice = input("\n❓ เลือก (0-4): ").strip()
-
-            if choice == '1':
-                self.add_member()
-            elif choice == '2':
-                self.view_members()
-            elif choice == '3':
-                self.update_member()
-            elif choice == '4':
-                self.delete_member()
-            elif choice == '0':
-                break
-            else:
-                print("\n❌ กรุณาเลือกเมนูที่ถูกต้อง (0-4)")
-                input("กด Enter เพื่อดำเนินการต่อ...")
+        self._run_submenu(self.show_member_menu, self._member_dispatch)
 
     def _handle_borrow_menu(self):
-        while True:
-            self.show_borrow_menu()
-            choice = input("\n❓ เลือก (0-4): ").strip()
-
-            if choice == '1':
-                self.add_borrow()
-            elif choice == '2':
-                self.return_book()
-            elif choice == '3':
-                self.view_borrows()
-            elif choice == '4':
-                self.delete_borrow()
-            elif choice == '0':
-                break
-            else:
-                print("\n❌ กรุณาเลือกเมนูที่ถูกต้อง (0-4)")
-                input("กด Enter เพื่อดำเนินการต่อ...")
+        self._run_submenu(self.show_borrow_menu, self._borrow_dispatch)
 